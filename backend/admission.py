@@ -0,0 +1,174 @@
+import asyncio
+import bisect
+import itertools
+import os
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from metrics import Counter, Gauge, Histogram
+
+# Configuration
+ADMISSION_ENABLED = os.environ.get("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_TOTAL_CONCURRENCY = int(os.environ.get("ADMISSION_TOTAL_CONCURRENCY", "200"))
+ADMISSION_RETRY_AFTER_SECONDS = int(os.environ.get("ADMISSION_RETRY_AFTER_SECONDS", "2"))
+
+# Never shed probes and scrapes
+EXEMPT_PATH_PREFIXES = ("/health/", "/metrics")
+
+class RouteClass(NamedTuple):
+    name: str
+    priority: int  # Lower is served first
+    max_concurrency: int
+    max_queue: int
+    max_wait_seconds: float
+
+def _route_class(name: str, priority: int, concurrency: int, queue: int, wait: float) -> RouteClass:
+    prefix = f"ADMISSION_{name.upper()}"
+    return RouteClass(
+        name,
+        priority,
+        int(os.environ.get(f"{prefix}_CONCURRENCY", concurrency)),
+        int(os.environ.get(f"{prefix}_QUEUE", queue)),
+        float(os.environ.get(f"{prefix}_MAX_WAIT_SECONDS", wait)),
+    )
+
+# Bookings and payments first, browsing last. Auth is kept small because
+# bcrypt work runs on the event loop.
+ROUTE_CLASSES: Dict[str, RouteClass] = {
+    c.name: c for c in (
+        _route_class("booking", 0, 50, 100, 5.0),
+        _route_class("auth", 1, 8, 50, 2.0),
+        _route_class("write", 1, 30, 50, 2.0),
+        _route_class("search", 2, 20, 40, 1.0),
+        _route_class("read", 3, 150, 200, 0.5),
+    )
+}
+
+def classify(scope: Scope) -> str:
+    method, path = scope["method"], scope["path"].rstrip("/")
+    if path.startswith(("/api/bookings", "/api/payments")) and method != "GET":
+        return "booking"
+    if path in ("/api/auth/login", "/api/auth/register"):
+        return "auth"
+    if path == "/api/properties/search":
+        return "search"
+    if method in ("GET", "HEAD", "OPTIONS"):
+        return "read"
+    return "write"
+
+admission_active = Gauge("admission_active_requests", "Admitted requests being handled", ("route_class",))
+admission_queued = Gauge("admission_queued_requests", "Requests waiting for admission", ("route_class",))
+admission_rejected = Counter("admission_rejected_total", "Requests shed by admission control", ("route_class", "reason"))
+admission_wait = Histogram("admission_wait_seconds", "Time spent waiting for admission", ("route_class",))
+
+class AdmissionController:
+    """Concurrency limiter with per-class caps, bounded wait queues and priorities.
+
+    A request runs when both its class and the total are under their caps.
+    Otherwise it waits in a queue ordered by class priority then arrival,
+    and is rejected when its class queue is full or its wait deadline passes.
+    """
+
+    def __init__(self, classes: Dict[str, RouteClass], total_concurrency: int):
+        self.classes = classes
+        self.total_concurrency = total_concurrency
+        self.total_active = 0
+        self.active: Dict[str, int] = {name: 0 for name in classes}
+        self.queued: Dict[str, int] = {name: 0 for name in classes}
+        self._waiters: List[Tuple[int, int, str, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    def _has_capacity(self, name: str) -> bool:
+        return (self.total_active < self.total_concurrency
+                and self.active[name] < self.classes[name].max_concurrency)
+
+    def _start(self, name: str):
+        self.total_active += 1
+        self.active[name] += 1
+        admission_active.set(self.active[name], route_class=name)
+
+    def _dispatch(self):
+        remaining = []
+        for waiter in self._waiters:
+            _, _, name, future = waiter
+            if future.done():
+                continue
+            if self._has_capacity(name):
+                self._start(name)
+                future.set_result(True)
+            else:
+                remaining.append(waiter)
+        self._waiters = remaining
+
+    async def acquire(self, name: str) -> Optional[str]:
+        """Wait for a slot; returns None when admitted or the rejection reason."""
+        route_class = self.classes[name]
+        if self._has_capacity(name) and not any(not w[3].done() for w in self._waiters):
+            self._start(name)
+            admission_wait.observe(0, route_class=name)
+            return None
+        if self.queued[name] >= route_class.max_queue:
+            admission_rejected.inc(route_class=name, reason="queue_full")
+            return "queue_full"
+
+        future = asyncio.get_running_loop().create_future()
+        bisect.insort(self._waiters, (route_class.priority, next(self._seq), name, future))
+        self.queued[name] += 1
+        admission_queued.set(self.queued[name], route_class=name)
+        self._dispatch()
+        start = time.perf_counter()
+        try:
+            await asyncio.wait({future}, timeout=route_class.max_wait_seconds)
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(name)
+            else:
+                future.cancel()
+            raise
+        finally:
+            self.queued[name] -= 1
+            admission_queued.set(self.queued[name], route_class=name)
+
+        admission_wait.observe(time.perf_counter() - start, route_class=name)
+        if future.done():
+            return None
+        future.cancel()
+        admission_rejected.inc(route_class=name, reason="timeout")
+        return "timeout"
+
+    def release(self, name: str):
+        self.total_active -= 1
+        self.active[name] -= 1
+        admission_active.set(self.active[name], route_class=name)
+        self._dispatch()
+
+class AdmissionMiddleware:
+    """Reject requests early with 503 and Retry-After when the worker is over capacity."""
+
+    def __init__(self, app: ASGIApp, controller: Optional[AdmissionController] = None):
+        self.app = app
+        self.controller = controller or AdmissionController(ROUTE_CLASSES, ADMISSION_TOTAL_CONCURRENCY)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PATH_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        name = classify(scope)
+        rejection = await self.controller.acquire(name)
+        if rejection:
+            response = JSONResponse(
+                {"detail": "The service is busy, please retry shortly"},
+                status_code=503,
+                headers={"Retry-After": str(ADMISSION_RETRY_AFTER_SECONDS)}
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(name)
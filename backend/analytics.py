@@ -0,0 +1,233 @@
+"""Owner analytics over materialized daily rollups.
+
+``property_daily_stats`` holds one document per property and night with at
+least one booked night or arrival:
+
+    {property_id, owner_id, date, nights_booked, revenue, arrivals, lead_time_days}
+
+Revenue is the booking price spread evenly over its nights; arrivals and
+lead times (days from booking to check-in) are counted on the check-in
+night. Only confirmed and completed bookings count.
+
+A booking state change pushes an ``analytics.refresh_daily_stats`` task into
+the booking's outbox, in the same write. The task recomputes the nights
+the booking covers (and covered before a date change) from the bookings,
+archived ones included, so it is idempotent and safe to retry.
+``rebuild_daily_stats`` rebuilds everything from history
+(``scripts/rebuild_daily_stats.py``).
+
+Monthly metrics (occupancy, revenue, ADR, lead time) are derived from the
+rollups with NumPy.
+"""
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import DeleteMany, UpdateOne
+
+from archive import find_booking
+from booking_dates import from_storage_date, overlap_filter, to_storage_date
+from models import BookingStatus
+from task_queue import outbox_entry
+
+logger = logging.getLogger(__name__)
+
+REFRESH_DAILY_STATS = "analytics.refresh_daily_stats"
+
+# Bookings that occupy their nights
+COUNTED_STATUSES = [BookingStatus.confirmed.value, BookingStatus.completed.value]
+
+BOOKING_PROJECTION = {"_id": 0, "id": 1, "property_id": 1, "check_in": 1, "check_out": 1,
+                      "total_price": 1, "created_at": 1}
+STATS_PROJECTION = {"_id": 0, "property_id": 1, "date": 1, "nights_booked": 1, "revenue": 1,
+                    "arrivals": 1, "lead_time_days": 1}
+
+def daily_stats_entry(booking: Dict[str, Any], previous_dates: Optional[Tuple[Any, Any]] = None) -> Dict[str, Any]:
+    """Outbox entry refreshing the rollups a booking covers (and covered before ``previous_dates``)."""
+    payload = {"booking_id": booking["id"], "property_id": booking["property_id"]}
+    dedup_key = f"{REFRESH_DAILY_STATS}:{booking['id']}"
+    if previous_dates:
+        payload["previous_start"] = from_storage_date(previous_dates[0]).isoformat()
+        payload["previous_end"] = from_storage_date(previous_dates[1]).isoformat()
+        dedup_key += f":{payload['previous_start']}:{payload['previous_end']}"
+    return outbox_entry(REFRESH_DAILY_STATS, payload, dedup_key)
+
+def compute_daily_stats(bookings: Iterable[Dict], start: date, end: date) -> Dict[str, np.ndarray]:
+    """Per-night stats of ``[start, end)`` for one property's counted bookings."""
+    days = (end - start).days
+    stats = {
+        "nights_booked": np.zeros(days, dtype=np.int64),
+        "revenue": np.zeros(days),
+        "arrivals": np.zeros(days, dtype=np.int64),
+        "lead_time_days": np.zeros(days, dtype=np.int64),
+    }
+    for booking in bookings:
+        check_in, check_out = from_storage_date(booking["check_in"]), from_storage_date(booking["check_out"])
+        nights = (check_out - check_in).days
+        if nights <= 0:
+            continue
+        first = max((check_in - start).days, 0)
+        last = min((check_out - start).days, days)
+        if first >= last:
+            continue
+        stats["nights_booked"][first:last] += 1
+        stats["revenue"][first:last] += booking.get("total_price", 0.0) / nights
+        if start <= check_in < end:
+            offset = (check_in - start).days
+            stats["arrivals"][offset] += 1
+            if booking.get("created_at"):
+                lead_time = (check_in - from_storage_date(booking["created_at"])).days
+                stats["lead_time_days"][offset] += max(lead_time, 0)
+    return stats
+
+def _stats_operations(
+    property_id: str,
+    owner_id: Optional[str],
+    start: date,
+    stats: Dict[str, np.ndarray],
+    delete_empty: bool = True
+) -> List:
+    """Upserts for the nights with activity and (optionally) one delete for the rest."""
+    now = datetime.utcnow()
+    operations, empty = [], []
+    active = (stats["nights_booked"] > 0) | (stats["arrivals"] > 0)
+    for offset in range(len(active)):
+        night = to_storage_date(start + timedelta(days=offset))
+        if not active[offset]:
+            empty.append(night)
+            continue
+        operations.append(UpdateOne(
+            {"property_id": property_id, "date": night},
+            {"$set": {
+                "owner_id": owner_id,
+                "nights_booked": int(stats["nights_booked"][offset]),
+                "revenue": round(float(stats["revenue"][offset]), 2),
+                "arrivals": int(stats["arrivals"][offset]),
+                "lead_time_days": int(stats["lead_time_days"][offset]),
+                "updated_at": now,
+            }},
+            upsert=True
+        ))
+    if empty and delete_empty:
+        operations.append(DeleteMany({"property_id": property_id, "date": {"$in": empty}}))
+    return operations
+
+async def _counted_bookings(db: AsyncIOMotorDatabase, query: Dict[str, Any]) -> List[Dict]:
+    """Matching bookings from the hot collection and the archive (hot copy wins)."""
+    bookings = await db.bookings.find(query, BOOKING_PROJECTION).to_list(None)
+    hot_ids = {booking["id"] for booking in bookings}
+    archived = await db.bookings_archive.find(query, BOOKING_PROJECTION).to_list(None)
+    return bookings + [booking for booking in archived if booking["id"] not in hot_ids]
+
+async def refresh_daily_stats(db: AsyncIOMotorDatabase, property_id: str, start: date, end: date):
+    """Recompute a property's rollups for ``[start, end)`` from its bookings."""
+    if end <= start:
+        return
+    property_data = await db.properties.find_one({"id": property_id}, {"_id": 0, "owner_id": 1})
+    bookings = await _counted_bookings(db, {
+        "property_id": property_id,
+        "status": {"$in": COUNTED_STATUSES},
+        **overlap_filter(start, end)
+    })
+
+    stats = compute_daily_stats(bookings, start, end)
+    owner_id = property_data["owner_id"] if property_data else None
+    await db.property_daily_stats.bulk_write(_stats_operations(property_id, owner_id, start, stats), ordered=False)
+
+async def refresh_booking_daily_stats(db: AsyncIOMotorDatabase, payload: Dict[str, Any]):
+    """Refresh the nights a booking covers now and, after a date change, covered before."""
+    booking = await find_booking(db, {"id": payload["booking_id"]}, {"_id": 0, "check_in": 1, "check_out": 1})
+    ranges = []
+    if booking:
+        ranges.append((from_storage_date(booking["check_in"]), from_storage_date(booking["check_out"])))
+    if payload.get("previous_start"):
+        ranges.append((from_storage_date(payload["previous_start"]), from_storage_date(payload["previous_end"])))
+    if ranges:
+        start, end = min(r[0] for r in ranges), max(r[1] for r in ranges)
+        await refresh_daily_stats(db, payload["property_id"], start, end)
+
+async def rebuild_daily_stats(db: AsyncIOMotorDatabase, property_ids: Optional[List[str]] = None) -> int:
+    """Rebuild the rollups of every (or the given) property from all bookings; returns the property count."""
+    query: Dict[str, Any] = {"id": {"$in": property_ids}} if property_ids else {}
+    rebuilt = 0
+    async for prop in db.properties.find(query, {"_id": 0, "id": 1, "owner_id": 1}):
+        bookings = await _counted_bookings(db, {"property_id": prop["id"], "status": {"$in": COUNTED_STATUSES}})
+        await db.property_daily_stats.delete_many({"property_id": prop["id"]})
+        if bookings:
+            start = min(from_storage_date(b["check_in"]) for b in bookings)
+            end = max(from_storage_date(b["check_out"]) for b in bookings)
+            operations = _stats_operations(
+                prop["id"], prop.get("owner_id"), start, compute_daily_stats(bookings, start, end), delete_empty=False
+            )
+            if operations:
+                await db.property_daily_stats.bulk_write(operations, ordered=False)
+        rebuilt += 1
+        if rebuilt % 100 == 0:
+            logger.info("Rebuilt daily stats for %d properties", rebuilt)
+    return rebuilt
+
+def next_month(day: date) -> date:
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def month_starts(start: date, end: date) -> List[date]:
+    """First day of every month overlapping ``[start, end)``."""
+    months, current = [], start.replace(day=1)
+    while current < end:
+        months.append(current)
+        current = next_month(current)
+    return months
+
+async def monthly_metrics(
+    db: AsyncIOMotorDatabase,
+    property_ids: List[str],
+    start: date,
+    end: date
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Per property and month of ``[start, end)``: occupancy, revenue, ADR and lead time."""
+    months = month_starts(start, end)
+    property_index = {property_id: i for i, property_id in enumerate(property_ids)}
+    shape = (len(property_ids), len(months))
+    nights_booked, revenue = np.zeros(shape), np.zeros(shape)
+    arrivals, lead_time_days = np.zeros(shape), np.zeros(shape)
+
+    docs = await db.property_daily_stats.find({
+        "property_id": {"$in": property_ids},
+        "date": {"$gte": to_storage_date(start), "$lt": to_storage_date(end)},
+    }, STATS_PROJECTION).to_list(None)
+    if docs:
+        rows = np.fromiter((property_index[doc["property_id"]] for doc in docs), dtype=np.int64, count=len(docs))
+        cols = np.fromiter(
+            ((doc["date"].year - months[0].year) * 12 + doc["date"].month - months[0].month for doc in docs),
+            dtype=np.int64, count=len(docs)
+        )
+        for target, field in ((nights_booked, "nights_booked"), (revenue, "revenue"),
+                              (arrivals, "arrivals"), (lead_time_days, "lead_time_days")):
+            np.add.at(target, (rows, cols), np.fromiter((doc[field] for doc in docs), dtype=float, count=len(docs)))
+
+    # Nights in each month that fall inside the requested range
+    bounds = [start] + months[1:] + [end]
+    available = np.diff(np.array(bounds, dtype="datetime64[D]")).astype(float)
+
+    occupancy = nights_booked / available
+    with np.errstate(divide="ignore", invalid="ignore"):
+        adr = np.where(nights_booked > 0, revenue / nights_booked, np.nan)
+        lead_time = np.where(arrivals > 0, lead_time_days / arrivals, np.nan)
+
+    def value(array: np.ndarray, i: int, j: int, digits: int) -> Optional[float]:
+        return None if np.isnan(array[i, j]) else round(float(array[i, j]), digits)
+
+    return {
+        property_id: [{
+            "month": month.strftime("%Y-%m"),
+            "nights_available": int(available[j]),
+            "nights_booked": int(nights_booked[i, j]),
+            "occupancy_rate": value(occupancy, i, j, 4),
+            "revenue": round(float(revenue[i, j]), 2),
+            "average_daily_rate": value(adr, i, j, 2),
+            "bookings": int(arrivals[i, j]),
+            "average_lead_time_days": value(lead_time, i, j, 1),
+        } for j, month in enumerate(months)]
+        for property_id, i in property_index.items()
+    }
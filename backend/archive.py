@@ -0,0 +1,140 @@
+"""Hot/cold archival of past bookings.
+
+Completed and cancelled bookings whose stay ended more than
+``ARCHIVE_HORIZON_DAYS`` ago are moved from ``bookings`` to
+``bookings_archive``, which only carries the indexes its read paths need.
+
+Each batch is copied (upsert by ``_id``) and then deleted from ``bookings``
+only if it is unchanged since the copy (same ``updated_at``). A booking
+changed in between stays hot and its archive copy is removed again. Every
+step is idempotent and the job keeps no state of its own: an interrupted
+run is resumed by running it again, which picks up whatever is still in
+``bookings``.
+
+``bookings`` stays authoritative: reads look there first and fall back to
+the archive (``find_booking``, ``user_bookings_pipeline``).
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import DeleteOne, ReplaceOne
+
+from metrics import Counter
+from models import BookingStatus
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+ARCHIVE_HORIZON_DAYS = int(os.environ.get("ARCHIVE_HORIZON_DAYS", "365"))
+ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVE_INTERVAL_SECONDS = int(os.environ.get("ARCHIVE_INTERVAL_SECONDS", "86400"))
+
+ARCHIVED_STATUSES = [BookingStatus.completed.value, BookingStatus.cancelled.value]
+
+bookings_archived = Counter("bookings_archived_total", "Bookings moved to the archive")
+
+def archivable_filter(cutoff: datetime) -> Dict[str, Any]:
+    return {
+        "status": {"$in": ARCHIVED_STATUSES},
+        "check_out": {"$lt": cutoff},
+        # Bookings with side effects still waiting in their outbox stay hot
+        "outbox.0": {"$exists": False},
+    }
+
+async def archive_batch(
+    db: AsyncIOMotorDatabase,
+    cutoff: datetime,
+    batch_size: int = ARCHIVE_BATCH_SIZE
+) -> Tuple[int, int]:
+    """Move one batch of archivable bookings; returns (selected, moved), (0, 0) when done."""
+    docs = await db.bookings.find(archivable_filter(cutoff)).limit(batch_size).to_list(None)
+    if not docs:
+        return 0, 0
+
+    now = datetime.utcnow()
+    await db.bookings_archive.bulk_write(
+        [ReplaceOne({"_id": doc["_id"]}, {**doc, "archived_at": now}, upsert=True) for doc in docs],
+        ordered=False
+    )
+    result = await db.bookings.bulk_write(
+        [DeleteOne({"_id": doc["_id"], "updated_at": doc.get("updated_at")}) for doc in docs],
+        ordered=False
+    )
+
+    if result.deleted_count < len(docs):
+        # Changed since the copy: keep the hot version only
+        kept = await db.bookings.find(
+            {"_id": {"$in": [doc["_id"] for doc in docs]}}, {"_id": 1}
+        ).to_list(None)
+        await db.bookings_archive.delete_many({"_id": {"$in": [doc["_id"] for doc in kept]}})
+
+    bookings_archived.inc(result.deleted_count)
+    return len(docs), result.deleted_count
+
+async def archive_bookings(
+    db: AsyncIOMotorDatabase,
+    horizon_days: int = ARCHIVE_HORIZON_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE
+) -> int:
+    """Archive every booking past the horizon, batch by batch; returns how many were moved."""
+    cutoff = datetime.utcnow() - timedelta(days=horizon_days)
+    archived = 0
+    while True:
+        selected, moved = await archive_batch(db, cutoff, batch_size)
+        if not selected:
+            break
+        archived += moved
+        # Let request handlers run between batches
+        await asyncio.sleep(0)
+    if archived:
+        logger.info("Archived %d bookings that ended before %s", archived, cutoff.date())
+    return archived
+
+async def run_booking_archival(db: AsyncIOMotorDatabase, interval: int = ARCHIVE_INTERVAL_SECONDS):
+    """Periodically archive past bookings (runs until cancelled)."""
+    while True:
+        try:
+            await archive_bookings(db)
+        except Exception:
+            logger.exception("Booking archival failed")
+        await asyncio.sleep(interval)
+
+async def find_booking(
+    db: AsyncIOMotorDatabase,
+    query: Dict[str, Any],
+    projection: Optional[Dict[str, Any]] = None
+) -> Optional[Dict]:
+    """Find a booking in ``bookings``, falling back to the archive."""
+    booking = await db.bookings.find_one(query, projection)
+    if booking is None:
+        booking = await db.bookings_archive.find_one(query, projection)
+    return booking
+
+def exclude_hot_copies() -> List[Dict[str, Any]]:
+    """Stages dropping archived bookings still present in ``bookings`` (copied mid-archival)."""
+    return [
+        {"$lookup": {
+            "from": "bookings",
+            "localField": "id",
+            "foreignField": "id",
+            "pipeline": [{"$project": {"_id": 1}}],
+            "as": "hot",
+        }},
+        {"$match": {"hot": {"$size": 0}}},
+        {"$unset": "hot"},
+    ]
+
+def user_bookings_pipeline(user_id: str) -> List[Dict[str, Any]]:
+    """A user's bookings from both collections, newest first, each booking once."""
+    return [
+        {"$match": {"user_id": user_id}},
+        {"$unionWith": {
+            "coll": "bookings_archive",
+            "pipeline": [{"$match": {"user_id": user_id}}, *exclude_hot_copies()],
+        }},
+        {"$sort": {"created_at": -1}},
+    ]
@@ -6,6 +6,8 @@ from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models import User, UserCreate, Session
+from tracing import start_span, traced
+from deadlines import read_deadline
 import os
 import secrets
 
@@ -22,11 +24,13 @@ security = HTTPBearer()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plaintext password against its hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    with start_span("bcrypt.verify"):
+        return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """Hash a password."""
-    return pwd_context.hash(password)
+    with start_span("bcrypt.hash"):
+        return pwd_context.hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
@@ -74,7 +78,8 @@ async def authenticate_user(db: AsyncIOMotorDatabase, email: str, password: str)
 async def create_user(db: AsyncIOMotorDatabase, user_data: UserCreate) -> User:
     """Create a new user in the database."""
     # Check if user already exists
-    existing_user = await get_user_by_email(db, user_data.email)
+    with read_deadline():
+        existing_user = await get_user_by_email(db, user_data.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -92,7 +97,7 @@ async def create_user(db: AsyncIOMotorDatabase, user_data: UserCreate) -> User:
     )
     
     # Insert into database
-    await db.users.insert_one(user.dict())
+    await db.users.insert_one(user.model_dump())
     return user
 
 async def create_session(db: AsyncIOMotorDatabase, user_id: str) -> str:
@@ -104,9 +109,10 @@ async def create_session(db: AsyncIOMotorDatabase, user_id: str) -> str:
         expires_at=datetime.utcnow() + timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS)
     )
     
-    await db.sessions.insert_one(session.dict())
+    await db.sessions.insert_one(session.model_dump())
     return token
 
+@traced("auth.get_current_user")
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> User:
@@ -128,17 +134,19 @@ async def get_current_user(
                 raise credentials_exception
         else:
             # Try session token
-            session_data = await db.sessions.find_one({
-                "token": credentials.credentials,
-                "expires_at": {"$gt": datetime.utcnow()}
-            })
+            with read_deadline():
+                session_data = await db.sessions.find_one({
+                    "token": credentials.credentials,
+                    "expires_at": {"$gt": datetime.utcnow()}
+                })
             if not session_data:
                 raise credentials_exception
             user_id = session_data["user_id"]
     except Exception:
         raise credentials_exception
     
-    user = await get_user_by_id(db, user_id)
+    with read_deadline():
+        user = await get_user_by_id(db, user_id)
     if user is None:
         raise credentials_exception
     
@@ -0,0 +1,43 @@
+"""Canonical storage of booking dates.
+
+Booking dates are stored as UTC-midnight datetimes (BSON dates), which
+compare and index natively; the API keeps exposing plain ``date`` values.
+A stay occupies the half-open interval ``[check_in, check_out)``, so a
+check-out and the next check-in on the same day do not conflict.
+
+Stays are at most ``MAX_BOOKING_NIGHTS`` long. That bounds the overlap
+query from below as well: a booking that starts more than that many nights
+before the requested check-in has ended by then, so the index scan on
+``(property_id, status, check_in, check_out)`` covers a fixed window
+instead of every past booking of the property. New bookings are held to
+the cap, and the date conversion migration refuses to complete while a
+stored pending, confirmed or completed stay exceeds it; lowering
+``MAX_BOOKING_NIGHTS`` later needs the same check.
+"""
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, Dict
+
+MAX_BOOKING_NIGHTS = int(os.environ.get("MAX_BOOKING_NIGHTS", "365"))
+
+def to_storage_date(day: date) -> datetime:
+    """A date as stored in MongoDB (naive datetimes are UTC)."""
+    return datetime(day.year, day.month, day.day)
+
+def from_storage_date(value: Any) -> date:
+    """A stored booking date; also accepts dates and the ISO strings of older documents."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+def overlap_filter(check_in: date, check_out: date) -> Dict[str, Any]:
+    """Match bookings whose stay overlaps ``[check_in, check_out)``."""
+    return {
+        "check_in": {
+            "$gt": to_storage_date(check_in - timedelta(days=MAX_BOOKING_NIGHTS)),
+            "$lt": to_storage_date(check_out),
+        },
+        "check_out": {"$gt": to_storage_date(check_in)},
+    }
@@ -0,0 +1,163 @@
+"""Bookings export for accounting.
+
+Bookings (hot, then archived) are read through an aggregation that joins
+each booking with its property and guest (``$lookup`` on the unique ``id``
+indexes, so the join is linear in the number of bookings) and are consumed
+in bounded batches. Each batch becomes a DataFrame that is appended to the
+output: a CSV chunk, or a Parquet row group written with Arrow. Memory is
+bounded by the batch size however many bookings are exported.
+"""
+import os
+from datetime import datetime
+from typing import AsyncIterator, Dict, IO, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from archive import exclude_hot_copies
+from streaming import iter_batches
+
+# Configuration
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_SPOOL_MAX_MEMORY_BYTES = int(os.environ.get("EXPORT_SPOOL_MAX_MEMORY_BYTES", str(8 * 1024 * 1024)))
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+FORMATS = ("csv", "parquet")
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Column order and Arrow types of the exported rows
+SCHEMA = pa.schema([
+    ("booking_id", pa.string()),
+    ("created_at", pa.timestamp("ms")),
+    ("check_in", pa.timestamp("ms")),
+    ("check_out", pa.timestamp("ms")),
+    ("guests", pa.int64()),
+    ("status", pa.string()),
+    ("payment_status", pa.string()),
+    ("total_price", pa.float64()),
+    ("property_id", pa.string()),
+    ("property_name", pa.string()),
+    ("property_city", pa.string()),
+    ("property_region", pa.string()),
+    ("owner_id", pa.string()),
+    ("user_id", pa.string()),
+    ("user_email", pa.string()),
+    ("user_first_name", pa.string()),
+    ("user_last_name", pa.string()),
+])
+COLUMNS = SCHEMA.names
+
+def export_pipeline(
+    start: datetime,
+    end: datetime,
+    statuses: Optional[List[str]] = None,
+    archive: bool = False
+) -> List[Dict]:
+    """Bookings created in ``[start, end)``, oldest first, flattened to export rows."""
+    match: Dict = {"created_at": {"$gte": start, "$lt": end}}
+    if statuses:
+        match["status"] = {"$in": statuses}
+    pipeline: List[Dict] = [{"$match": match}, {"$sort": {"created_at": 1}}]
+    if archive:
+        pipeline += exclude_hot_copies()
+    return pipeline + [
+        {"$lookup": {
+            "from": "properties",
+            "localField": "property_id",
+            "foreignField": "id",
+            "pipeline": [{"$project": {"_id": 0, "name": 1, "location.city": 1, "location.region": 1, "owner_id": 1}}],
+            "as": "property",
+        }},
+        {"$lookup": {
+            "from": "users",
+            "localField": "user_id",
+            "foreignField": "id",
+            "pipeline": [{"$project": {"_id": 0, "email": 1, "first_name": 1, "last_name": 1}}],
+            "as": "user",
+        }},
+        {"$set": {"property": {"$first": "$property"}, "user": {"$first": "$user"}}},
+        {"$project": {
+            "_id": 0,
+            "booking_id": "$id",
+            "created_at": 1,
+            "check_in": 1,
+            "check_out": 1,
+            "guests": 1,
+            "status": 1,
+            "payment_status": 1,
+            "total_price": 1,
+            "property_id": 1,
+            "property_name": "$property.name",
+            "property_city": "$property.location.city",
+            "property_region": "$property.location.region",
+            "owner_id": "$property.owner_id",
+            "user_id": 1,
+            "user_email": "$user.email",
+            "user_first_name": "$user.first_name",
+            "user_last_name": "$user.last_name",
+        }},
+    ]
+
+async def iter_export_frames(
+    db: AsyncIOMotorDatabase,
+    start: datetime,
+    end: datetime,
+    statuses: Optional[List[str]] = None,
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> AsyncIterator[pd.DataFrame]:
+    """Yield the export rows as DataFrames of at most ``batch_size`` bookings (hot, then archived)."""
+    for collection, archive in ((db.bookings, False), (db.bookings_archive, True)):
+        cursor = collection.aggregate(export_pipeline(start, end, statuses, archive))
+        async for batch in iter_batches(cursor, batch_size):
+            yield pd.DataFrame.from_records(batch, columns=COLUMNS)
+
+async def iter_csv(frames: AsyncIterator[pd.DataFrame]) -> AsyncIterator[bytes]:
+    """Render frames as one CSV document, chunk by chunk."""
+    header = True
+    async for frame in frames:
+        yield frame.to_csv(index=False, header=header, date_format="%Y-%m-%dT%H:%M:%S").encode()
+        header = False
+    if header:
+        yield (",".join(COLUMNS) + "\n").encode()
+
+async def write_parquet(frames: AsyncIterator[pd.DataFrame], sink: IO[bytes]) -> int:
+    """Write frames to ``sink`` as Parquet, one row group per frame; returns the row count."""
+    rows = 0
+    with pq.ParquetWriter(sink, SCHEMA) as writer:
+        async for frame in frames:
+            writer.write_table(pa.Table.from_pandas(frame, schema=SCHEMA, preserve_index=False))
+            rows += len(frame)
+    return rows
+
+async def write_csv(frames: AsyncIterator[pd.DataFrame], sink: IO[bytes]) -> int:
+    """Write frames to ``sink`` as CSV; returns the row count."""
+    rows = 0
+
+    async def counted():
+        nonlocal rows
+        async for frame in frames:
+            rows += len(frame)
+            yield frame
+
+    async for chunk in iter_csv(counted()):
+        sink.write(chunk)
+    return rows
+
+async def export_bookings(
+    db: AsyncIOMotorDatabase,
+    sink: IO[bytes],
+    fmt: str,
+    start: datetime,
+    end: datetime,
+    statuses: Optional[List[str]] = None
+) -> int:
+    """Export bookings created in ``[start, end)`` to a binary file; returns the row count."""
+    frames = iter_export_frames(db, start, end, statuses)
+    if fmt == "parquet":
+        return await write_parquet(frames, sink)
+    return await write_csv(frames, sink)
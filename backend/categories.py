@@ -0,0 +1,37 @@
+from typing import Callable, Dict, List
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+# Amenity IDs that make a property eligible for the pet-friendly category
+PET_AMENITY_IDS = {"pets-allowed", "pet-friendly"}
+
+SHORT_STAY_MAX_NIGHTS = 3
+LARGE_GROUP_MIN_GUESTS = 12
+
+# Inspiration category slug -> membership rule over a property document
+CATEGORY_RULES: Dict[str, Callable[[Dict], bool]] = {
+    "couples": lambda p: p.get("bedrooms", 0) <= 2 and p.get("max_guests", 0) <= 4,
+    "large-groups": lambda p: p.get("max_guests", 0) >= LARGE_GROUP_MIN_GUESTS,
+    "short-breaks": lambda p: p.get("minimum_stay", 1) <= SHORT_STAY_MAX_NIGHTS,
+    "pet-friendly": lambda p: bool(PET_AMENITY_IDS.intersection(p.get("amenities", []))),
+}
+
+def categorize_property(property_data: Dict) -> List[str]:
+    """Return the inspiration category slugs a property belongs to."""
+    return [slug for slug, rule in CATEGORY_RULES.items() if rule(property_data)]
+
+async def refresh_property_categories(db: AsyncIOMotorDatabase, batch_size: int = 500):
+    """Recompute stored category membership for every property (e.g. after a rule change)."""
+    projection = {"_id": 0, "id": 1, "bedrooms": 1, "max_guests": 1,
+                  "minimum_stay": 1, "amenities": 1, "categories": 1}
+    operations = []
+    async for prop in db.properties.find({}, projection).batch_size(batch_size):
+        categories = categorize_property(prop)
+        if prop.get("categories") != categories:
+            operations.append(UpdateOne({"id": prop["id"]}, {"$set": {"categories": categories}}))
+        if len(operations) >= batch_size:
+            await db.properties.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        await db.properties.bulk_write(operations, ordered=False)
@@ -0,0 +1,73 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from metrics import Counter, Gauge
+
+T = TypeVar("T")
+
+coalesced_requests = Counter(
+    "coalesced_requests_total", "Reads served by single-flight coalescing", ("key", "role")
+)
+coalesced_in_flight = Gauge("coalesced_in_flight", "Shared computations currently running", ("key",))
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """Share one in-flight computation between concurrent identical reads.
+
+    The first caller for a key (the leader) starts the computation as its own
+    task; callers arriving while it runs (followers) await the same task.
+    Every caller receives the result or the exception it raised, including
+    ``HTTPException``. Nothing is cached: the key is released as soon as the
+    computation finishes, so the next request runs it again.
+
+    A caller that is cancelled (client disconnect, admission timeout) stops
+    waiting without affecting the others; the computation is cancelled only
+    when no caller is left. It runs in the leader's context, so it is bounded
+    by the leader's database deadline.
+
+    Only coalesce reads whose result does not depend on the caller, and treat
+    shared results as read-only.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        label = str(key[0]) if isinstance(key, tuple) else str(key)
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._finish(key, flight, label))
+            coalesced_in_flight.inc(key=label)
+            coalesced_requests.inc(key=label, role="leader")
+        else:
+            coalesced_requests.inc(key=label, role="follower")
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.task.cancelled() or flight.task.done():
+                raise
+            if flight.waiters == 1:
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _finish(self, key: Hashable, flight: _Flight, label: str):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        coalesced_in_flight.dec(key=label)
+        # Mark the exception retrieved even if every waiter has gone
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+single_flight = SingleFlight()
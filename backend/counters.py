@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import os
+import re
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from categories import refresh_property_categories
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+COUNTS_RECONCILE_INTERVAL_SECONDS = int(os.environ.get("COUNTS_RECONCILE_INTERVAL_SECONDS", "3600"))
+
+def region_matches_destination(region: str, destination_name: str) -> bool:
+    """Check whether a property region belongs to a destination (same rule as the old $regex count)."""
+    return re.search(destination_name, region or "", re.IGNORECASE) is not None
+
+def is_counted(property_data: Optional[Dict]) -> bool:
+    """Only active properties count towards materialized totals."""
+    return bool(property_data) and property_data.get("is_active", True)
+
+def _region(property_data: Optional[Dict]) -> str:
+    return (property_data or {}).get("location", {}).get("region", "")
+
+def _category_slugs(property_data: Optional[Dict]) -> Set[str]:
+    if not is_counted(property_data):
+        return set()
+    return set(property_data.get("categories", []))
+
+async def _shift_counts(collection, key: str, removed: Set[str], added: Set[str]):
+    # updated_at moves with the count so HTTP validators change too
+    if removed:
+        await collection.update_many(
+            {key: {"$in": list(removed)}},
+            {"$inc": {"property_count": -1}, "$set": {"updated_at": datetime.utcnow()}}
+        )
+    if added:
+        await collection.update_many(
+            {key: {"$in": list(added)}},
+            {"$inc": {"property_count": 1}, "$set": {"updated_at": datetime.utcnow()}}
+        )
+
+def _destination_ids(destinations: List[Dict], property_data: Optional[Dict]) -> Set[str]:
+    if not is_counted(property_data):
+        return set()
+    region = _region(property_data)
+    return {d["id"] for d in destinations if region_matches_destination(region, d["name"])}
+
+async def apply_property_count_changes(
+    db: AsyncIOMotorDatabase,
+    before: Optional[Dict],
+    after: Optional[Dict]
+):
+    """Incrementally adjust materialized counts after a property write.
+
+    ``before`` and ``after`` are the property documents on either side of the
+    write (``None`` when the property did not exist).
+    """
+    old_slugs, new_slugs = _category_slugs(before), _category_slugs(after)
+    await _shift_counts(db.inspiration_categories, "slug", old_slugs - new_slugs, new_slugs - old_slugs)
+
+    if is_counted(before) == is_counted(after) and _region(before) == _region(after):
+        return
+
+    destinations = await db.destinations.find({}, {"_id": 0, "id": 1, "name": 1}).to_list(None)
+    old_ids = _destination_ids(destinations, before)
+    new_ids = _destination_ids(destinations, after)
+    await _shift_counts(db.destinations, "id", old_ids - new_ids, new_ids - old_ids)
+
+async def apply_bulk_property_count_changes(
+    db: AsyncIOMotorDatabase,
+    changes: List[Tuple[Optional[Dict], Optional[Dict]]]
+):
+    """Apply the net count changes of many property writes (``(before, after)`` pairs) at once."""
+    destinations = await db.destinations.find({}, {"_id": 0, "id": 1, "name": 1}).to_list(None)
+    category_deltas: Counter = Counter()
+    destination_deltas: Counter = Counter()
+    for before, after in changes:
+        category_deltas.subtract(_category_slugs(before))
+        category_deltas.update(_category_slugs(after))
+        destination_deltas.subtract(_destination_ids(destinations, before))
+        destination_deltas.update(_destination_ids(destinations, after))
+
+    for collection, key, deltas in (
+        (db.inspiration_categories, "slug", category_deltas),
+        (db.destinations, "id", destination_deltas),
+    ):
+        for value, delta in deltas.items():
+            if delta:
+                await collection.update_one(
+                    {key: value},
+                    {"$inc": {"property_count": delta}, "$set": {"updated_at": datetime.utcnow()}}
+                )
+
+async def reconcile_property_counts(db: AsyncIOMotorDatabase):
+    """Recompute all materialized counts from the properties collection to fix drift."""
+    region_counts = await db.properties.aggregate([
+        {"$match": {"is_active": True}},
+        {"$group": {"_id": "$location.region", "count": {"$sum": 1}}}
+    ]).to_list(None)
+
+    destinations = await db.destinations.find({}, {"_id": 0, "id": 1, "name": 1}).to_list(None)
+    for dest in destinations:
+        property_count = sum(
+            r["count"] for r in region_counts
+            if region_matches_destination(r["_id"], dest["name"])
+        )
+        await db.destinations.update_one(
+            {"id": dest["id"], "property_count": {"$ne": property_count}},
+            {"$set": {"property_count": property_count, "updated_at": datetime.utcnow()}}
+        )
+
+    await refresh_property_categories(db)
+    category_counts = await db.properties.aggregate([
+        {"$match": {"is_active": True}},
+        {"$unwind": "$categories"},
+        {"$group": {"_id": "$categories", "count": {"$sum": 1}}}
+    ]).to_list(None)
+    counts_by_slug = {c["_id"]: c["count"] for c in category_counts}
+
+    categories = await db.inspiration_categories.find({}, {"_id": 0, "slug": 1}).to_list(None)
+    for category in categories:
+        property_count = counts_by_slug.get(category["slug"], 0)
+        await db.inspiration_categories.update_one(
+            {"slug": category["slug"], "property_count": {"$ne": property_count}},
+            {"$set": {"property_count": property_count, "updated_at": datetime.utcnow()}}
+        )
+
+async def run_count_reconciliation(db: AsyncIOMotorDatabase, interval: int = COUNTS_RECONCILE_INTERVAL_SECONDS):
+    """Periodically reconcile materialized counts (runs until cancelled)."""
+    while True:
+        try:
+            await reconcile_property_counts(db)
+        except Exception:
+            logger.exception("Property count reconciliation failed")
+        await asyncio.sleep(interval)
@@ -1,11 +1,33 @@
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import IndexModel
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
 from typing import Optional
+import asyncio
 import os
 from datetime import datetime
 
+from db_monitoring import CommandMetricsListener, PoolMetricsListener
+from query_audit import QueryAuditListener, query_audit_enabled
+from tracing import TracingListener
+
+# Connection pool and timeout configuration
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get("MONGO_MAX_IDLE_TIME_MS", "60000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS", "20000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+
+# Read preference for read-only public routes; only differs from the primary
+# when connected to a replica set
+MONGO_PUBLIC_READ_PREFERENCE = os.environ.get("MONGO_PUBLIC_READ_PREFERENCE", "secondaryPreferred")
+MONGO_MAX_STALENESS_SECONDS = int(os.environ.get("MONGO_MAX_STALENESS_SECONDS", "-1"))
+
 class Database:
     client: Optional[AsyncIOMotorClient] = None
     database: Optional[AsyncIOMotorDatabase] = None
+    read_database: Optional[AsyncIOMotorDatabase] = None
 
 db_instance = Database()
 
@@ -14,11 +36,34 @@ async def connect_to_mongo():
     mongo_url = os.environ.get("MONGO_URL")
     db_name = os.environ.get("DB_NAME", "purefrance")
     
-    db_instance.client = AsyncIOMotorClient(mongo_url)
+    event_listeners = [CommandMetricsListener(), PoolMetricsListener(), TracingListener()]
+    if query_audit_enabled():
+        event_listeners.append(QueryAuditListener())
+    
+    db_instance.client = AsyncIOMotorClient(
+        mongo_url,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+        waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        event_listeners=event_listeners
+    )
     db_instance.database = db_instance.client[db_name]
+    db_instance.read_database = db_instance.client.get_database(
+        db_name,
+        read_preference=make_read_preference(
+            read_pref_mode_from_name(MONGO_PUBLIC_READ_PREFERENCE),
+            tag_sets=None,
+            max_staleness=MONGO_MAX_STALENESS_SECONDS
+        )
+    )
     
-    # Create indexes for better performance
-    await create_indexes()
+    # Bring indexes and seed data up to date (a single read once current)
+    from migrations import apply_migrations
+    await apply_migrations(db_instance.database)
     
     print(f"Connected to MongoDB: {db_name}")
 
@@ -31,56 +76,116 @@ async def get_database() -> AsyncIOMotorDatabase:
     """Get database instance"""
     return db_instance.database
 
-async def create_indexes():
-    """Create database indexes for better performance"""
-    db = db_instance.database
-    
-    # User indexes
-    await db.users.create_index("email", unique=True)
-    await db.users.create_index("id", unique=True)
-    
-    # Property indexes
-    await db.properties.create_index("id", unique=True)
-    await db.properties.create_index("owner_id")
-    await db.properties.create_index("location.region")
-    await db.properties.create_index("property_type")
-    await db.properties.create_index("price_per_night")
-    await db.properties.create_index("is_active")
-    await db.properties.create_index([("location.latitude", 1), ("location.longitude", 1)])
-    
-    # Booking indexes
-    await db.bookings.create_index("id", unique=True)
-    await db.bookings.create_index("user_id")
-    await db.bookings.create_index("property_id")
-    await db.bookings.create_index([("check_in", 1), ("check_out", 1)])
-    await db.bookings.create_index("status")
-    
-    # Blog post indexes
-    await db.blog_posts.create_index("slug", unique=True)
-    await db.blog_posts.create_index("published")
-    await db.blog_posts.create_index("published_at")
-    
-    # Review indexes
-    await db.reviews.create_index("property_id")
-    await db.reviews.create_index("user_id")
-    await db.reviews.create_index("rating")
-    
-    # Session indexes
-    await db.sessions.create_index("token", unique=True)
-    await db.sessions.create_index("user_id")
-    await db.sessions.create_index("expires_at", expireAfterSeconds=0)
-    
-    # Destination indexes
-    await db.destinations.create_index("slug", unique=True)
-    await db.destinations.create_index("featured")
-    
-    # Special offer indexes
-    await db.special_offers.create_index("active")
-    await db.special_offers.create_index([("valid_from", 1), ("valid_until", 1)])
+async def get_read_database() -> AsyncIOMotorDatabase:
+    """Get database instance for read-only public routes (may read from secondaries)"""
+    return db_instance.read_database
+
+# Index declarations per collection (compound indexes follow the route query
+# shapes, see scripts/index_audit.py)
+INDEXES = {
+    "users": [
+        IndexModel("email", unique=True),
+        IndexModel("id", unique=True),
+        IndexModel("updated_at"),
+    ],
+    "properties": [
+        IndexModel("id", unique=True),
+        IndexModel("owner_id"),
+        IndexModel("location.region"),
+        IndexModel("property_type"),
+        IndexModel("price_per_night"),
+        IndexModel("is_active"),
+        IndexModel([("location.latitude", 1), ("location.longitude", 1)]),
+        IndexModel([("categories", 1), ("is_active", 1)]),
+        IndexModel([("is_active", 1), ("created_at", -1)]),
+        IndexModel(
+            [("owner_id", 1), ("external_ref", 1)],
+            unique=True,
+            partialFilterExpression={"external_ref": {"$type": "string"}}
+        ),
+        IndexModel("updated_at"),
+    ],
+    "bookings": [
+        IndexModel("id", unique=True),
+        IndexModel([("user_id", 1), ("created_at", -1)]),
+        IndexModel([("user_id", 1), ("property_id", 1), ("status", 1)]),
+        IndexModel([("property_id", 1), ("status", 1), ("check_in", 1), ("check_out", 1)]),
+        IndexModel([("status", 1), ("check_in", 1), ("check_out", 1)]),
+        IndexModel("created_at"),
+        IndexModel("outbox.id", sparse=True),
+    ],
+    # Only what the archive read paths need: lookups by id, user history,
+    # analytics rebuilds and exports
+    "bookings_archive": [
+        IndexModel("id", unique=True),
+        IndexModel([("user_id", 1), ("created_at", -1)]),
+        IndexModel([("property_id", 1), ("check_in", 1)]),
+        IndexModel("created_at"),
+    ],
+    "property_daily_stats": [
+        IndexModel([("property_id", 1), ("date", 1)], unique=True),
+        IndexModel([("owner_id", 1), ("date", 1)]),
+    ],
+    "blog_posts": [
+        IndexModel("slug", unique=True),
+        IndexModel([("published", 1), ("published_at", -1)]),
+        IndexModel("updated_at"),
+    ],
+    "reviews": [
+        IndexModel("id", unique=True),
+        IndexModel([("property_id", 1), ("created_at", -1)]),
+        IndexModel([("user_id", 1), ("property_id", 1)]),
+        IndexModel("outbox.id", sparse=True),
+    ],
+    "payments": [
+        IndexModel("id", unique=True),
+        IndexModel("booking_id", unique=True, partialFilterExpression={"open": True}),
+        IndexModel([("booking_id", 1), ("created_at", -1)]),
+        IndexModel("outbox.id", sparse=True),
+        # Stale submitted intents for reconciliation (open ones only: a small index)
+        IndexModel([("status", 1), ("updated_at", 1)], partialFilterExpression={"open": True}),
+    ],
+    "tasks": [
+        IndexModel("id", unique=True),
+        IndexModel([("status", 1), ("run_at", 1)]),
+        IndexModel([("status", 1), ("locked_until", 1)]),
+        IndexModel(
+            "dedup_key",
+            unique=True,
+            partialFilterExpression={"status": "pending", "dedup_key": {"$type": "string"}}
+        ),
+        IndexModel("expires_at", expireAfterSeconds=0),
+    ],
+    "sessions": [
+        IndexModel("token", unique=True),
+        IndexModel("user_id"),
+        IndexModel("expires_at", expireAfterSeconds=0),
+    ],
+    "destinations": [
+        IndexModel("slug", unique=True),
+        IndexModel("featured"),
+        IndexModel("updated_at"),
+    ],
+    "inspiration_categories": [
+        IndexModel("slug", unique=True),
+        IndexModel("updated_at"),
+    ],
+    "special_offers": [
+        IndexModel([("active", 1), ("valid_until", 1)]),
+        IndexModel("updated_at"),
+    ],
+}
+
+async def create_indexes(db: Optional[AsyncIOMotorDatabase] = None):
+    """Create database indexes, one batched createIndexes command per collection, concurrently"""
+    db = db if db is not None else db_instance.database
+    await asyncio.gather(*(
+        db[collection].create_indexes(indexes) for collection, indexes in INDEXES.items()
+    ))
 
-async def init_sample_data():
+async def init_sample_data(db: Optional[AsyncIOMotorDatabase] = None):
     """Initialize database with sample data"""
-    db = db_instance.database
+    db = db if db is not None else db_instance.database
     
     # Check if data already exists
     destination_count = await db.destinations.count_documents({})
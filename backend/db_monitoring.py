@@ -0,0 +1,92 @@
+import threading
+from typing import Dict, Tuple
+
+from pymongo import monitoring
+
+from metrics import Counter, Gauge, Histogram
+
+mongo_command_duration = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency", ("collection", "command")
+)
+mongo_commands_total = Counter(
+    "mongo_commands_total", "MongoDB commands issued", ("collection", "command", "outcome")
+)
+mongo_pool_connections = Gauge(
+    "mongo_pool_connections", "Open connections in the driver pool", ("address",)
+)
+mongo_pool_checked_out = Gauge(
+    "mongo_pool_checked_out_connections", "Pool connections currently checked out", ("address",)
+)
+
+def command_collection(command_name: str, command: Dict) -> str:
+    """Extract the target collection from a command document."""
+    if command_name == "getMore":
+        return str(command.get("collection", ""))
+    target = command.get(command_name)
+    return target if isinstance(target, str) else ""
+
+def _address(address) -> str:
+    return f"{address[0]}:{address[1]}" if address else ""
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Record per-collection, per-command latency and counts."""
+
+    def __init__(self):
+        self._pending: Dict[Tuple, str] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = command_collection(
+                event.command_name, event.command
+            )
+
+    def _finished(self, event, outcome: str):
+        with self._lock:
+            collection = self._pending.pop((event.connection_id, event.request_id), "")
+        mongo_command_duration.observe(
+            event.duration_micros / 1e6, collection=collection, command=event.command_name
+        )
+        mongo_commands_total.inc(collection=collection, command=event.command_name, outcome=outcome)
+
+    def succeeded(self, event):
+        self._finished(event, "success")
+
+    def failed(self, event):
+        self._finished(event, "failure")
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Track open and checked-out connections per server."""
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        mongo_pool_connections.inc(address=_address(event.address))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        mongo_pool_connections.dec(address=_address(event.address))
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pass
+
+    def connection_checked_out(self, event):
+        mongo_pool_checked_out.inc(address=_address(event.address))
+
+    def connection_checked_in(self, event):
+        mongo_pool_checked_out.dec(address=_address(event.address))
@@ -0,0 +1,144 @@
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+import pymongo
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from pymongo.errors import PyMongoError
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from metrics import resolve_route
+from streaming import NDJSON_MEDIA_TYPE
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+REQUEST_DB_BUDGET_MS = int(os.environ.get("REQUEST_DB_BUDGET_MS", "2000"))
+DEADLINE_RETRY_AFTER_SECONDS = int(os.environ.get("DEADLINE_RETRY_AFTER_SECONDS", "2"))
+
+# Per-route database time budgets (route template -> milliseconds)
+ROUTE_BUDGETS_MS = {
+    "/api/properties/search": 3000,
+    "/api/properties": 1500,
+    "/api/destinations": 1000,
+    "/api/inspiration": 1000,
+    "/api/special-offers": 1000,
+    "/health/ready": 1000,
+}
+
+# Routes that stream their body; each batch gets its own budget (streaming.STREAM_BATCH_BUDGET_MS)
+STREAMED_ROUTES = {"/api/properties/import", "/api/bookings/export"}
+
+# Read-only by HTTP semantics, so the whole handler can run under the budget
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Deadline (time.monotonic) of the current request's reads, for read_deadline()
+_read_deadline: ContextVar[Optional[float]] = ContextVar("read_deadline", default=None)
+
+def route_budget_ms(route: str) -> int:
+    return ROUTE_BUDGETS_MS.get(route, REQUEST_DB_BUDGET_MS)
+
+def is_streamed(route: str, scope: Scope) -> bool:
+    accept = dict(scope["headers"]).get(b"accept", b"").decode("latin-1")
+    return route in STREAMED_ROUTES or NDJSON_MEDIA_TYPE in accept
+
+def read_deadline():
+    """Apply what is left of the request budget to reads that precede a write or a stream.
+
+    Does nothing where the whole handler already runs under the budget.
+    """
+    deadline = _read_deadline.get()
+    if deadline is None:
+        return contextlib.nullcontext()
+    # pymongo.timeout(0) means no timeout, so an exhausted budget gets a minimal one
+    return pymongo.timeout(max(deadline - time.monotonic(), 0.001))
+
+class DeadlineMiddleware:
+    """Bound the database time of each request and stop work for departed clients.
+
+    The budget is applied with ``pymongo.timeout``: the driver derives
+    ``maxTimeMS`` for every command (finds, getMores, aggregations) from the
+    time remaining, and Motor carries the deadline onto its executor threads.
+
+    Only reads are bounded, so a request never fails with 503 after some of
+    its writes have been committed. GET and HEAD handlers run entirely under
+    the budget. Handlers of other methods wrap the reads that precede their
+    first write in ``read_deadline()``; their writes are left to the driver's
+    socket timeouts. Streamed requests have no total budget either: their
+    leading reads use ``read_deadline()`` and ``iter_batches`` gives every
+    batch its own.
+
+    If the client disconnects before the response completes, the handler task
+    is cancelled; cursors being streamed are closed by their iterators and
+    any server-side operation still running stops at its ``maxTimeMS``.
+    """
+
+    def __init__(self, app: ASGIApp, routes: list):
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = resolve_route(self.routes, scope)
+        budget_seconds = route_budget_ms(route) / 1000
+        whole_handler = scope["method"] in SAFE_METHODS and not is_streamed(route, scope)
+        messages: asyncio.Queue = asyncio.Queue()
+        response_complete = False
+
+        async def send_wrapper(message: Message):
+            nonlocal response_complete
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+            await send(message)
+
+        async def run_handler():
+            if whole_handler:
+                with pymongo.timeout(budget_seconds):
+                    await self.app(scope, messages.get, send_wrapper)
+                return
+            # The handler task has its own context, so this does not leak
+            _read_deadline.set(time.monotonic() + budget_seconds)
+            await self.app(scope, messages.get, send_wrapper)
+
+        handler = asyncio.create_task(run_handler())
+
+        async def watch_disconnect():
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    if not response_complete and not handler.done():
+                        logger.info("Client disconnected from %s %s; cancelling handler", scope["method"], scope["path"])
+                        handler.cancel()
+                    return
+
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            await handler
+        except asyncio.CancelledError:
+            if not handler.cancelled():
+                raise
+        finally:
+            watcher.cancel()
+            if not handler.done():
+                handler.cancel()
+
+async def database_error_handler(request: Request, exc: PyMongoError):
+    """Map budget overruns to 503 with a retry hint; other driver errors to 500."""
+    if exc.timeout:
+        logger.warning("Database deadline exceeded for %s %s: %s", request.method, request.url.path, exc)
+        return JSONResponse(
+            {"detail": "The service is busy, please retry shortly"},
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": str(DEADLINE_RETRY_AFTER_SECONDS)}
+        )
+    logger.exception("Database error for %s %s", request.method, request.url.path, exc_info=exc)
+    return JSONResponse({"detail": "Internal Server Error"}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,152 @@
+import asyncio
+import contextvars
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import TypeAdapter
+
+from http_cache import Validators, collection_validators, make_validators
+from offers_cache import offer_cache
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+HOME_BUNDLE_CHECK_INTERVAL_SECONDS = int(os.environ.get("HOME_BUNDLE_CHECK_INTERVAL_SECONDS", "30"))
+HOME_LATEST_PROPERTIES = 12
+HOME_LATEST_POSTS = 4
+
+# Only the fields the homepage components render
+DESTINATION_PROJECTION = {
+    "_id": 0, "id": 1, "name": 1, "slug": 1, "description": 1, "image_url": 1, "featured": 1, "property_count": 1
+}
+INSPIRATION_PROJECTION = {
+    "_id": 0, "id": 1, "title": 1, "slug": 1, "description": 1, "image_url": 1, "property_count": 1
+}
+PROPERTY_PROJECTION = {
+    "_id": 0, "id": 1, "name": 1, "bedrooms": 1, "property_type": 1, "max_guests": 1, "price_per_night": 1,
+    "average_rating": 1, "location.region": 1, "images": {"$slice": 1}
+}
+BLOG_POST_PROJECTION = {
+    "_id": 0, "id": 1, "title": 1, "slug": 1, "excerpt": 1, "featured_image": 1, "published_at": 1, "author_id": 1
+}
+OFFER_FIELDS = ("id", "title", "description", "discount_percentage", "valid_from", "valid_until", "property_ids")
+
+_bundle_adapter = TypeAdapter(Dict[str, Any])
+
+async def _latest_blog_posts(db: AsyncIOMotorDatabase) -> List[Dict]:
+    posts = await db.blog_posts.find({"published": True}, BLOG_POST_PROJECTION) \
+        .sort("published_at", -1).limit(HOME_LATEST_POSTS).to_list(HOME_LATEST_POSTS)
+    author_ids = list({post["author_id"] for post in posts if post.get("author_id")})
+    authors = await db.users.find(
+        {"id": {"$in": author_ids}}, {"_id": 0, "id": 1, "first_name": 1}
+    ).to_list(None)
+    authors_by_id = {author["id"]: author for author in authors}
+    for post in posts:
+        post["author"] = authors_by_id.get(post.pop("author_id", None))
+    return posts
+
+async def build_home_bundle(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+    """Gather every homepage section concurrently."""
+    destinations, inspiration, properties, blog_posts, offers = await asyncio.gather(
+        db.destinations.find({}, DESTINATION_PROJECTION).to_list(None),
+        db.inspiration_categories.find({}, INSPIRATION_PROJECTION).to_list(None),
+        db.properties.find({"is_active": True}, PROPERTY_PROJECTION)
+            .sort("created_at", -1).limit(HOME_LATEST_PROPERTIES).to_list(HOME_LATEST_PROPERTIES),
+        _latest_blog_posts(db),
+        offer_cache.get_active_offers(db),
+    )
+    return {
+        "destinations": destinations,
+        "inspiration": inspiration,
+        "properties": properties,
+        "blog_posts": blog_posts,
+        "special_offers": [{field: offer.get(field) for field in OFFER_FIELDS} for offer in offers],
+        "generated_at": datetime.utcnow(),
+    }
+
+async def content_fingerprint(db: AsyncIOMotorDatabase) -> Tuple:
+    """Cheap summary of everything the bundle is built from."""
+    validators = await asyncio.gather(
+        collection_validators(db.destinations),
+        collection_validators(db.inspiration_categories),
+        collection_validators(db.properties, {"is_active": True}),
+        collection_validators(db.blog_posts, {"published": True}),
+    )
+    # Offers start and stop at validity boundaries without any write
+    offer_ids = tuple(offer["id"] for offer in await offer_cache.get_active_offers(db))
+    return tuple(v.etag for v in validators) + offer_ids
+
+class HomeBundleCache:
+    """The homepage bundle, kept pre-serialised in memory.
+
+    Requests are served the stored bytes. ``invalidate`` marks the bundle
+    stale and rebuilds it in the background; until the rebuild finishes the
+    previous bundle keeps being served. Only the first request after startup
+    waits for a build.
+    """
+
+    def __init__(self):
+        self.body: Optional[bytes] = None
+        self.validators: Optional[Validators] = None
+        self._fingerprint: Optional[Tuple] = None
+        self._lock = asyncio.Lock()
+        self._rebuild: Optional[asyncio.Task] = None
+        self._stale = False
+        self._db: Optional[AsyncIOMotorDatabase] = None
+
+    async def refresh(self, db: AsyncIOMotorDatabase):
+        """Rebuild and re-serialise the bundle."""
+        async with self._lock:
+            await self._build(db)
+
+    async def _build(self, db: AsyncIOMotorDatabase):
+        fingerprint = await content_fingerprint(db)
+        bundle = await build_home_bundle(db)
+        self.body = _bundle_adapter.dump_json(bundle)
+        self.validators = make_validators("home", *fingerprint, last_modified=bundle["generated_at"])
+        self._fingerprint = fingerprint
+        self._db = db
+
+    async def refresh_if_changed(self, db: AsyncIOMotorDatabase):
+        if await content_fingerprint(db) != self._fingerprint:
+            await self.refresh(db)
+
+    def invalidate(self):
+        """Rebuild in the background (call after homepage content is written)."""
+        if self._db is None:
+            return
+        self._stale = True
+        if self._rebuild is None or self._rebuild.done():
+            # A fresh context, so the rebuild is not bound by the caller's request deadline
+            self._rebuild = asyncio.create_task(
+                self._rebuild_in_background(self._db), context=contextvars.Context()
+            )
+
+    async def _rebuild_in_background(self, db: AsyncIOMotorDatabase):
+        while self._stale:
+            self._stale = False
+            try:
+                await self.refresh(db)
+            except Exception:
+                logger.exception("Home bundle rebuild failed")
+
+    async def get(self, db: AsyncIOMotorDatabase) -> Tuple[bytes, Validators]:
+        if self.body is None:
+            async with self._lock:
+                if self.body is None:
+                    await self._build(db)
+        return self.body, self.validators
+
+home_bundle = HomeBundleCache()
+
+async def run_home_bundle_refresh(db: AsyncIOMotorDatabase, interval: int = HOME_BUNDLE_CHECK_INTERVAL_SECONDS):
+    """Rebuild the bundle whenever its content fingerprint changes (runs until cancelled)."""
+    while True:
+        try:
+            await home_bundle.refresh_if_changed(db)
+        except Exception:
+            logger.exception("Home bundle refresh failed")
+        await asyncio.sleep(interval)
@@ -0,0 +1,102 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, NamedTuple, Optional
+
+from fastapi import Request, Response, status
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+# Configuration
+HTTP_CACHE_MAX_AGE = int(os.environ.get("HTTP_CACHE_MAX_AGE", "60"))
+HTTP_CACHE_STALE_WHILE_REVALIDATE = int(os.environ.get("HTTP_CACHE_STALE_WHILE_REVALIDATE", "300"))
+
+# Projection for the fields validators are derived from
+VALIDATOR_PROJECTION = {"_id": 0, "id": 1, "created_at": 1, "updated_at": 1}
+
+class Validators(NamedTuple):
+    etag: str
+    last_modified: Optional[datetime]
+
+def _modified_at(doc: Optional[Dict]) -> Optional[datetime]:
+    if not doc:
+        return None
+    return doc.get("updated_at") or doc.get("created_at")
+
+def make_validators(*parts, last_modified: Optional[datetime] = None) -> Validators:
+    """Build a weak ETag from arbitrary version parts."""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:20]
+    return Validators(etag=f'W/"{digest}"', last_modified=last_modified)
+
+def document_validators(*docs: Optional[Dict]) -> Validators:
+    """Validators for a response built from the given (projected) documents."""
+    timestamps = [_modified_at(doc) for doc in docs]
+    known = [t for t in timestamps if t is not None]
+    parts = [(doc or {}).get("id") for doc in docs] + timestamps
+    return make_validators(*parts, last_modified=max(known) if known else None)
+
+async def collection_validators(collection: AsyncIOMotorCollection, filter_query: Optional[Dict] = None) -> Validators:
+    """Validators for a whole-collection listing, from one small aggregation."""
+    result = await collection.aggregate([
+        {"$match": filter_query or {}},
+        {"$group": {
+            "_id": None,
+            "last_modified": {"$max": {"$ifNull": ["$updated_at", "$created_at"]}},
+            "count": {"$sum": 1}
+        }}
+    ]).to_list(1)
+    if not result:
+        return make_validators(collection.name, 0)
+    last_modified = result[0]["last_modified"]
+    return make_validators(collection.name, result[0]["count"], last_modified, last_modified=last_modified)
+
+def _http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+def _is_not_modified(request: Request, validators: Validators) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence; compare weakly
+        tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        return "*" in tags or validators.etag.removeprefix("W/") in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and validators.last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        modified = validators.last_modified
+        if modified.tzinfo is None:
+            modified = modified.replace(tzinfo=timezone.utc)
+        return modified.replace(microsecond=0) <= since
+    return False
+
+def cache_headers(validators: Validators, max_age: int = HTTP_CACHE_MAX_AGE) -> Dict[str, str]:
+    """Caching headers for a public, revalidatable response."""
+    headers = {
+        "ETag": validators.etag,
+        "Cache-Control": f"public, max-age={max_age}, stale-while-revalidate={HTTP_CACHE_STALE_WHILE_REVALIDATE}",
+    }
+    if validators.last_modified:
+        headers["Last-Modified"] = _http_date(validators.last_modified)
+    return headers
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    validators: Validators,
+    max_age: int = HTTP_CACHE_MAX_AGE
+) -> Optional[Response]:
+    """Return a 304 response if the client copy is current, else set caching headers.
+
+    Route handlers call this before building their body and return the 304
+    response when one is given.
+    """
+    headers = cache_headers(validators, max_age)
+    if _is_not_modified(request, validators):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,214 @@
+"""Cross-worker cache invalidation.
+
+Every worker tails one database-level change stream, filtered to the
+collections its in-process caches subscribe to, and fans typed
+``InvalidationEvent``s out to those caches, so a write handled by one
+worker invalidates the caches of all the others. Events carry the
+changed document's key, never the document itself.
+
+The resume token is only kept in memory: a reconnecting watcher resumes
+where it stopped, and a stream opened without one (at startup, or after the
+history was lost) flushes every cache first, since the caches are
+in-process and nothing they hold can be vouched for by a new stream.
+
+When change streams are unavailable (a standalone mongod), the watcher
+polls a per-collection fingerprint instead (the estimated document count
+and the latest ``updated_at``, read from the ``updated_at`` index) and
+publishes collection-wide ``flush`` events.
+
+Change streams need a replica set; a single-node one is enough locally:
+    mongod --replSet rs0 --dbpath /tmp/rs0 && mongosh --eval 'rs.initiate()'
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure, PyMongoError
+
+from home_bundle import home_bundle
+from metrics import Counter, Gauge
+from offers_cache import offer_cache
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+INVALIDATION_MODE = os.environ.get("INVALIDATION_MODE", "auto")  # auto, poll or off
+INVALIDATION_POLL_SECONDS = float(os.environ.get("INVALIDATION_POLL_SECONDS", "5"))
+INVALIDATION_RETRY_SECONDS = float(os.environ.get("INVALIDATION_RETRY_SECONDS", "2"))
+
+# $changeStream on a standalone server
+CHANGE_STREAMS_UNSUPPORTED = {40573}
+# The resume token is no longer in the oplog, or the stream cannot continue
+CHANGE_STREAM_HISTORY_LOST = {280, 286}
+
+FLUSH = "flush"
+
+invalidation_events = Counter(
+    "cache_invalidation_events_total", "Invalidation events published", ("collection", "operation", "source")
+)
+invalidation_change_stream_active = Gauge(
+    "cache_invalidation_change_stream_active", "1 while tailing a change stream, 0 while polling"
+)
+
+class InvalidationEvent(NamedTuple):
+    collection: str
+    operation: str  # insert, update, replace, delete or flush (whole collection)
+    document_key: Any = None  # The document's ``_id`` (None for flushes)
+    updated_fields: Tuple[str, ...] = ()
+
+Handler = Callable[[InvalidationEvent], None]
+
+class InvalidationBus:
+    """Fan invalidation events out to the caches subscribed to each collection."""
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Handler]] = {}
+
+    def subscribe(self, collections: Sequence[str], handler: Handler):
+        for collection in collections:
+            self._handlers.setdefault(collection, []).append(handler)
+
+    def publish(self, event: InvalidationEvent, source: str = "change_stream"):
+        invalidation_events.inc(collection=event.collection, operation=event.operation, source=source)
+        for handler in self._handlers.get(event.collection, []):
+            try:
+                handler(event)
+            except Exception:
+                logger.exception("Invalidation handler %r failed for %s", handler, event)
+
+    def collections(self) -> List[str]:
+        """Collections with at least one subscriber."""
+        return list(self._handlers)
+
+    def flush_all(self, source: str):
+        for collection in list(self._handlers):
+            self.publish(InvalidationEvent(collection, FLUSH), source=source)
+
+invalidation_bus = InvalidationBus()
+
+def event_from_change(change: Dict) -> Optional[InvalidationEvent]:
+    collection = change.get("ns", {}).get("coll")
+    operation = change["operationType"]
+    if operation in ("drop", "rename", "dropDatabase", "invalidate"):
+        return InvalidationEvent(collection, FLUSH) if collection else None
+    return InvalidationEvent(
+        collection,
+        operation,
+        (change.get("documentKey") or {}).get("_id"),
+        tuple((change.get("updateDescription") or {}).get("updatedFields", {}))
+    )
+
+class InvalidationWatcher:
+    """Tail the change stream (or poll) and publish events until cancelled."""
+
+    def __init__(self, db: AsyncIOMotorDatabase, bus: InvalidationBus = invalidation_bus,
+                 collections: Optional[Sequence[str]] = None):
+        self.db = db
+        self.bus = bus
+        # Only collections some cache is built from (subscribe before creating the watcher)
+        self.collections = list(collections) if collections is not None else bus.collections()
+        self._token: Optional[Dict] = None
+
+    def _pipeline(self) -> List[Dict]:
+        # Keep events small: only the fields the bus publishes
+        return [
+            {"$match": {"ns.coll": {"$in": self.collections}}},
+            {"$project": {
+                "operationType": 1, "ns": 1, "documentKey": 1, "updateDescription.updatedFields": 1
+            }},
+        ]
+
+    async def watch(self):
+        """Tail the change stream; raises OperationFailure when it cannot be opened."""
+        async with self.db.watch(self._pipeline(), resume_after=self._token) as stream:
+            invalidation_change_stream_active.set(1)
+            if self._token is None:
+                # Changes made before the stream opened were not seen
+                self.bus.flush_all(source="resync")
+            logger.info("Watching %s for cache invalidation", ", ".join(self.collections))
+            while stream.alive:
+                change = await stream.try_next()
+                self._token = stream.resume_token
+                if change is not None:
+                    event = event_from_change(change)
+                    if event:
+                        self.bus.publish(event)
+                    if change["operationType"] == "invalidate":
+                        # The stream is closed and cannot be resumed past this event
+                        self._token = None
+                        return
+
+    async def _fingerprint(self, collection: str) -> Tuple[int, Optional[datetime]]:
+        """Estimated document count (metadata) and latest ``updated_at`` (one index entry)."""
+        cursor = self.db[collection].find({}, {"_id": 0, "updated_at": 1}).sort("updated_at", -1).limit(1)
+        latest = await cursor.to_list(1)
+        return (
+            await self.db[collection].estimated_document_count(),
+            latest[0].get("updated_at") if latest else None,
+        )
+
+    async def poll(self):
+        """Publish a flush for each collection whose fingerprint changes."""
+        invalidation_change_stream_active.set(0)
+        logger.info("Polling %s every %ss for cache invalidation", ", ".join(self.collections), INVALIDATION_POLL_SECONDS)
+        fingerprints: Dict[str, Tuple[int, Optional[datetime]]] = {}
+        while True:
+            for collection in self.collections:
+                try:
+                    fingerprint = await self._fingerprint(collection)
+                except PyMongoError:
+                    logger.exception("Invalidation poll of %s failed", collection)
+                    continue
+                previous = fingerprints.get(collection)
+                fingerprints[collection] = fingerprint
+                if previous is not None and fingerprint != previous:
+                    self.bus.publish(InvalidationEvent(collection, FLUSH), source="poll")
+            await asyncio.sleep(INVALIDATION_POLL_SECONDS)
+
+    async def run(self, mode: str = INVALIDATION_MODE):
+        if mode == "poll":
+            await self.poll()
+            return
+        while True:
+            try:
+                await self.watch()
+            except OperationFailure as exc:
+                if exc.code in CHANGE_STREAMS_UNSUPPORTED:
+                    logger.warning("Change streams unavailable (%s); falling back to polling", exc)
+                    await self.poll()
+                    return
+                if exc.code in CHANGE_STREAM_HISTORY_LOST:
+                    # Events were missed: restart from now (which flushes the caches)
+                    logger.warning("Change stream history lost (%s); flushing caches", exc)
+                    self._token = None
+                    continue
+                logger.exception("Invalidation change stream failed")
+            except PyMongoError:
+                logger.exception("Invalidation change stream failed")
+            finally:
+                invalidation_change_stream_active.set(0)
+            # Resume from the last token; no events are lost while reconnecting
+            await asyncio.sleep(INVALIDATION_RETRY_SECONDS)
+
+def _invalidate_home_bundle(event: InvalidationEvent):
+    # Only author names are rendered from users
+    if event.collection == "users" and event.operation == "update" and "first_name" not in event.updated_fields:
+        return
+    home_bundle.invalidate()
+
+def register_caches(bus: InvalidationBus = invalidation_bus):
+    """Subscribe the in-process caches to the collections they are built from."""
+    bus.subscribe(["special_offers"], lambda event: offer_cache.invalidate())
+    bus.subscribe(
+        ["destinations", "inspiration_categories", "properties", "blog_posts", "special_offers", "users"],
+        _invalidate_home_bundle
+    )
+
+async def run_invalidation_watcher(db: AsyncIOMotorDatabase):
+    """Publish invalidation events for this worker (runs until cancelled)."""
+    if INVALIDATION_MODE == "off":
+        return
+    await InvalidationWatcher(db).run()
@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, NamedTuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from booking_dates import MAX_BOOKING_NIGHTS
+from database import create_indexes, init_sample_data
+from models import BookingStatus
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+MIGRATION_LOCK_TTL_SECONDS = int(os.environ.get("MIGRATION_LOCK_TTL_SECONDS", "300"))
+# Renew the lock well before it expires while a migration runs
+MIGRATION_LOCK_RENEW_SECONDS = MIGRATION_LOCK_TTL_SECONDS / 3
+MIGRATION_WAIT_SECONDS = int(os.environ.get("MIGRATION_WAIT_SECONDS", "120"))
+MIGRATION_POLL_SECONDS = 0.5
+
+MS_PER_DAY = 24 * 60 * 60 * 1000
+
+SCHEMA_DOC_ID = "schema"
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[AsyncIOMotorDatabase], Awaitable[None]]
+
+async def _create_indexes(db: AsyncIOMotorDatabase):
+    await create_indexes(db)
+
+async def _seed_sample_data(db: AsyncIOMotorDatabase):
+    await init_sample_data(db)
+
+async def _drop_superseded_indexes(db: AsyncIOMotorDatabase):
+    superseded = {
+        "bookings": ["user_id_1", "property_id_1", "check_in_1_check_out_1", "status_1"],
+        "blog_posts": ["published_1", "published_at_1"],
+        "reviews": ["property_id_1", "user_id_1", "rating_1"],
+        "special_offers": ["active_1", "valid_from_1_valid_until_1"],
+    }
+    for collection, names in superseded.items():
+        for name in names:
+            try:
+                await db[collection].drop_index(name)
+            except OperationFailure:
+                pass  # Already dropped (or never created)
+
+async def _convert_booking_dates(db: AsyncIOMotorDatabase):
+    """Store booking dates as UTC-midnight datetimes (see booking_dates)."""
+    for collection in (db.bookings, db.bookings_archive):
+        for field in ("check_in", "check_out"):
+            # ISO strings ("2025-07-01" or a full timestamp) -> the date's midnight
+            await collection.update_many({field: {"$type": "string"}}, [{"$set": {field: {"$dateFromString": {
+                "dateString": {"$substrBytes": [f"${field}", 0, 10]}, "format": "%Y-%m-%d", "timezone": "UTC"
+            }}}}])
+            # Datetimes with a time of day -> the same day's midnight ($dateTrunc needs MongoDB 5.0)
+            truncated = {"$dateFromParts": {
+                "year": {"$year": f"${field}"}, "month": {"$month": f"${field}"}, "day": {"$dayOfMonth": f"${field}"}
+            }}
+            await collection.update_many(
+                {field: {"$type": "date"}, "$expr": {"$ne": [f"${field}", truncated]}},
+                [{"$set": {field: truncated}}]
+            )
+    await _check_stay_lengths(db)
+
+async def _check_stay_lengths(db: AsyncIOMotorDatabase):
+    """Refuse to go on while a stay that blocks or counts nights is longer than MAX_BOOKING_NIGHTS.
+
+    overlap_filter only looks back MAX_BOOKING_NIGHTS before a check-in, so
+    a longer stay would be missed by availability checks and analytics.
+    """
+    overlong = {
+        "status": {"$in": [BookingStatus.pending.value, BookingStatus.confirmed.value, BookingStatus.completed.value]},
+        # Dates are midnights by now, so the difference is whole days ($dateDiff needs MongoDB 5.0)
+        "$expr": {"$gt": [{"$subtract": ["$check_out", "$check_in"]}, MAX_BOOKING_NIGHTS * MS_PER_DAY]},
+    }
+    for collection in (db.bookings, db.bookings_archive):
+        ids = [doc["id"] for doc in await collection.find(overlong, {"_id": 0, "id": 1}).limit(20).to_list(None)]
+        if ids:
+            raise RuntimeError(
+                f"{collection.name} has stays longer than MAX_BOOKING_NIGHTS={MAX_BOOKING_NIGHTS} "
+                f"(e.g. {', '.join(ids)}); shorten or cancel them, or raise MAX_BOOKING_NIGHTS, and restart"
+            )
+
+async def _index_booking_overlaps(db: AsyncIOMotorDatabase):
+    # Build (property_id, status, check_in, check_out) before dropping its prefix
+    await create_indexes(db)
+    try:
+        await db.bookings.drop_index("property_id_1_status_1_check_in_1")
+    except OperationFailure:
+        pass  # Already dropped (or never created)
+
+async def _drop_change_stream_tokens(db: AsyncIOMotorDatabase):
+    # Resume tokens are kept in memory only (see invalidation)
+    await db.drop_collection("change_stream_tokens")
+
+# Ordered schema migrations. Each must be idempotent: a process that dies
+# mid-migration leaves the version unchanged and the step is re-run.
+# When database.INDEXES changes, append a migration that calls create_indexes.
+MIGRATIONS: List[Migration] = [
+    Migration(1, "create indexes", _create_indexes),
+    Migration(2, "seed sample content", _seed_sample_data),
+    Migration(3, "drop single-field indexes superseded by compound indexes", _drop_superseded_indexes),
+    Migration(4, "index latest active properties for the homepage bundle", _create_indexes),
+    Migration(5, "index the task queue and review outboxes", _create_indexes),
+    Migration(6, "index payment intents", _create_indexes),
+    Migration(7, "index owner listing references for bulk import upserts", _create_indexes),
+    Migration(8, "index booking creation dates for exports", _create_indexes),
+    Migration(9, "index owner analytics rollups and booking outboxes", _create_indexes),
+    Migration(10, "index the bookings archive", _create_indexes),
+    Migration(11, "store booking dates as UTC-midnight datetimes", _convert_booking_dates),
+    Migration(12, "index booking overlaps by property, status and stay", _index_booking_overlaps),
+    Migration(13, "expire change stream tokens of departed workers", _create_indexes),
+    Migration(14, "index update times for invalidation polling", _create_indexes),
+    Migration(15, "drop persisted change stream tokens", _drop_change_stream_tokens),
+    Migration(16, "index open payments for reconciliation", _create_indexes),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+async def get_schema_version(db: AsyncIOMotorDatabase) -> int:
+    doc = await db.schema_migrations.find_one({"_id": SCHEMA_DOC_ID}, {"version": 1})
+    return doc["version"] if doc else 0
+
+async def _acquire_lock(db: AsyncIOMotorDatabase, owner: str) -> bool:
+    now = datetime.utcnow()
+    try:
+        lock = await db.migration_locks.find_one_and_update(
+            {"_id": SCHEMA_DOC_ID, "$or": [{"expires_at": {"$lt": now}}, {"owner": owner}]},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=MIGRATION_LOCK_TTL_SECONDS)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        return False  # Another process holds an unexpired lock
+    return lock is not None and lock["owner"] == owner
+
+async def _release_lock(db: AsyncIOMotorDatabase, owner: str):
+    await db.migration_locks.delete_one({"_id": SCHEMA_DOC_ID, "owner": owner})
+
+async def _keep_lock(db: AsyncIOMotorDatabase, owner: str, task: asyncio.Task):
+    """Renew the lock while ``task`` runs; cancel it if the lock is lost."""
+    while True:
+        await asyncio.sleep(MIGRATION_LOCK_RENEW_SECONDS)
+        try:
+            renewed = await _acquire_lock(db, owner)
+        except Exception:
+            # The lease is still valid until it expires; retry on the next beat
+            logger.exception("Failed to renew the migration lock")
+            continue
+        if not renewed:
+            task.cancel()
+            return
+
+async def _apply_with_lock(db: AsyncIOMotorDatabase, owner: str, migration: Migration):
+    apply = asyncio.ensure_future(migration.apply(db))
+    heartbeat = asyncio.create_task(_keep_lock(db, owner, apply))
+    try:
+        await apply
+    except asyncio.CancelledError:
+        if heartbeat.done():
+            raise RuntimeError(f"Lost the migration lock while applying migration {migration.version}") from None
+        raise
+    finally:
+        heartbeat.cancel()
+
+async def _run_pending(db: AsyncIOMotorDatabase, owner: str):
+    version = await get_schema_version(db)
+    for migration in MIGRATIONS:
+        if migration.version <= version:
+            continue
+        if not await _acquire_lock(db, owner):
+            raise RuntimeError(f"Lost the migration lock before migration {migration.version}")
+        logger.info("Applying migration %s: %s", migration.version, migration.description)
+        await _apply_with_lock(db, owner, migration)
+        if not await _acquire_lock(db, owner):
+            raise RuntimeError(f"Lost the migration lock before recording migration {migration.version}")
+        await db.schema_migrations.update_one(
+            {"_id": SCHEMA_DOC_ID},
+            {"$set": {"version": migration.version, "applied_at": datetime.utcnow(), "applied_by": owner}},
+            upsert=True
+        )
+
+async def apply_migrations(db: AsyncIOMotorDatabase, wait: bool = True):
+    """Bring the schema up to date.
+
+    Costs one read when the schema is current. Otherwise one process takes
+    the migration lock and applies pending migrations while the others wait
+    for the version to catch up (or return immediately with ``wait=False``).
+    """
+    if await get_schema_version(db) >= LATEST_VERSION:
+        return
+
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    deadline = asyncio.get_running_loop().time() + MIGRATION_WAIT_SECONDS
+    while True:
+        if await _acquire_lock(db, owner):
+            try:
+                await _run_pending(db, owner)
+            finally:
+                await _release_lock(db, owner)
+            return
+
+        if not wait:
+            return
+        await asyncio.sleep(MIGRATION_POLL_SECONDS)
+        if await get_schema_version(db) >= LATEST_VERSION:
+            return
+        if asyncio.get_running_loop().time() > deadline:
+            raise RuntimeError(f"Timed out waiting for schema migrations to reach version {LATEST_VERSION}")
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, EmailStr, validator
+from pydantic import BaseModel, Field, EmailStr, ValidationInfo, field_validator
 from typing import List, Optional, Dict, Any
 from datetime import datetime, date
 from enum import Enum
@@ -18,6 +18,7 @@ class BookingStatus(str, Enum):
 
 class PaymentStatus(str, Enum):
     pending = "pending"
+    processing = "processing"
     completed = "completed"
     failed = "failed"
     refunded = "refunded"
@@ -113,8 +114,11 @@ class PropertyBase(BaseModel):
     price_per_night: float
     images: List[PropertyImage] = []
     amenities: List[str] = []  # Amenity IDs
+    minimum_stay: int = 1  # Nights
+    external_ref: Optional[str] = None  # Owner's own listing reference (bulk import upsert key)
     
-    @validator('bedrooms', 'bathrooms', 'max_guests')
+    @field_validator('bedrooms', 'bathrooms', 'max_guests', 'minimum_stay')
+    @classmethod
     def validate_positive(cls, v):
         if v <= 0:
             raise ValueError('Must be positive')
@@ -132,12 +136,14 @@ class PropertyUpdate(BaseModel):
     price_per_night: Optional[float] = None
     images: Optional[List[PropertyImage]] = None
     amenities: Optional[List[str]] = None
+    minimum_stay: Optional[int] = None
 
 class Property(PropertyBase, BaseDBModel):
     owner_id: str
     is_active: bool = True
     average_rating: Optional[float] = None
     review_count: int = 0
+    categories: List[str] = []  # Inspiration category slugs
 
 class PropertyResponse(Property):
     availability: List[Availability] = []
@@ -161,18 +167,20 @@ class Destination(DestinationBase, BaseDBModel):
 # Booking Models
 class BookingBase(BaseModel):
     property_id: str
-    check_in: date
-    check_out: date
+    check_in: date  # Stored as a UTC-midnight datetime (see booking_dates)
+    check_out: date  # Exclusive: the guest leaves that morning
     guests: int
     special_requests: Optional[str] = None
 
-    @validator('check_out')
-    def validate_dates(cls, v, values):
-        if 'check_in' in values and v <= values['check_in']:
+    @field_validator('check_out')
+    @classmethod
+    def validate_dates(cls, v, info: ValidationInfo):
+        if 'check_in' in info.data and v <= info.data['check_in']:
             raise ValueError('Check-out must be after check-in')
         return v
 
-    @validator('guests')
+    @field_validator('guests')
+    @classmethod
     def validate_guests(cls, v):
         if v <= 0:
             raise ValueError('Must have at least 1 guest')
@@ -235,7 +243,8 @@ class SpecialOfferBase(BaseModel):
     valid_until: datetime
     property_ids: List[str] = []
 
-    @validator('discount_percentage')
+    @field_validator('discount_percentage')
+    @classmethod
     def validate_discount(cls, v):
         if v <= 0 or v > 100:
             raise ValueError('Discount must be between 0 and 100')
@@ -253,7 +262,8 @@ class ReviewBase(BaseModel):
     title: str
     content: str
 
-    @validator('rating')
+    @field_validator('rating')
+    @classmethod
     def validate_rating(cls, v):
         if v < 1 or v > 5:
             raise ValueError('Rating must be between 1 and 5')
@@ -0,0 +1,64 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+# Upper bound on staleness for offer changes made outside this process
+OFFERS_CACHE_MAX_AGE_SECONDS = int(os.environ.get("OFFERS_CACHE_MAX_AGE_SECONDS", "300"))
+
+class SpecialOfferCache:
+    """In-memory set of currently active special offers.
+
+    The cache expires at the next ``valid_from``/``valid_until`` boundary of any
+    known offer, so offers start and stop applying on time without a database
+    query per request.
+    """
+
+    def __init__(self):
+        self._active: List[Dict] = []
+        self._expires_at: Optional[datetime] = None
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        """Force a reload on next access (call after offers are written)."""
+        self._expires_at = None
+
+    def _is_fresh(self, now: datetime) -> bool:
+        return self._expires_at is not None and now < self._expires_at
+
+    async def refresh(self, db: AsyncIOMotorDatabase):
+        """Reload offers that are active now or start in the future."""
+        now = datetime.utcnow()
+        offers = await db.special_offers.find(
+            {"active": True, "valid_until": {"$gte": now}},
+            {"_id": 0}
+        ).to_list(None)
+
+        active = []
+        next_boundary = now + timedelta(seconds=OFFERS_CACHE_MAX_AGE_SECONDS)
+        for offer in offers:
+            if offer["valid_from"] > now:
+                next_boundary = min(next_boundary, offer["valid_from"])
+                continue
+            next_boundary = min(next_boundary, offer["valid_until"])
+            active.append(offer)
+
+        self._active = active
+        # valid_until is inclusive, so expire just after it
+        self._expires_at = next_boundary + timedelta(microseconds=1)
+
+    async def _ensure_fresh(self, db: AsyncIOMotorDatabase):
+        if self._is_fresh(datetime.utcnow()):
+            return
+        async with self._lock:
+            if not self._is_fresh(datetime.utcnow()):
+                await self.refresh(db)
+
+    async def get_active_offers(self, db: AsyncIOMotorDatabase) -> List[Dict]:
+        """Get all currently active offers."""
+        await self._ensure_fresh(db)
+        return self._active
+
+offer_cache = SpecialOfferCache()
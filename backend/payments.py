@@ -0,0 +1,296 @@
+"""Asynchronous payment processing.
+
+A payment is a state machine stored in the ``payments`` collection:
+
+    pending --submit--> submitted --webhook--> succeeded | failed
+       \\--------------(synchronous gateway answer)--------^
+
+``process_payment`` only records a pending intent (with its submit task in
+the same write) and answers 202. A task worker submits the intent to the
+gateway; the gateway later calls the webhook, which finalises the payment
+and the booking. Every step is conditional on the current state, so
+retried tasks and repeated webhooks are harmless, and the intent id is sent
+as the gateway idempotency key so a retried submission never charges twice.
+
+The booking is only confirmed if its price still equals the charged
+amount; date changes, which reprice a booking, and cancellations are
+refused while a payment is open. A charge that still succeeds against a
+cancelled booking is flagged ``refund_required``. Webhooks are rejected while ``PAYMENT_WEBHOOK_SECRET`` is unset.
+
+Run the local stand-in with ``python scripts/fake_gateway.py``.
+"""
+import asyncio
+import hashlib
+import hmac
+from abc import ABC, abstractmethod
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, NamedTuple, Optional
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from analytics import daily_stats_entry
+from metrics import Counter, Histogram
+from models import BookingStatus, PaymentStatus
+from task_queue import task_queue
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+PAYMENT_GATEWAY_URL = os.environ.get("PAYMENT_GATEWAY_URL", "http://localhost:8099")
+PAYMENT_GATEWAY_TIMEOUT_SECONDS = float(os.environ.get("PAYMENT_GATEWAY_TIMEOUT_SECONDS", "10"))
+PAYMENT_GATEWAY_MAX_CONNECTIONS = int(os.environ.get("PAYMENT_GATEWAY_MAX_CONNECTIONS", "20"))
+PAYMENT_GATEWAY_CONNECT_RETRIES = int(os.environ.get("PAYMENT_GATEWAY_CONNECT_RETRIES", "2"))
+# Required: without it every webhook is rejected
+PAYMENT_WEBHOOK_SECRET = os.environ.get("PAYMENT_WEBHOOK_SECRET")
+PAYMENT_CALLBACK_URL = os.environ.get("PAYMENT_CALLBACK_URL", "http://localhost:8001/api/payments/webhook")
+PAYMENT_CURRENCY = os.environ.get("PAYMENT_CURRENCY", "EUR")
+# Submitted intents without a webhook for this long are re-queried from the gateway...
+PAYMENT_RECONCILE_AFTER_SECONDS = int(os.environ.get("PAYMENT_RECONCILE_AFTER_SECONDS", "900"))
+PAYMENT_RECONCILE_INTERVAL_SECONDS = int(os.environ.get("PAYMENT_RECONCILE_INTERVAL_SECONDS", "300"))
+PAYMENT_RECONCILE_BATCH_SIZE = int(os.environ.get("PAYMENT_RECONCILE_BATCH_SIZE", "100"))
+# ...and failed as expired once the gateway has not settled them for this long
+PAYMENT_EXPIRE_AFTER_SECONDS = int(os.environ.get("PAYMENT_EXPIRE_AFTER_SECONDS", "86400"))
+
+SIGNATURE_HEADER = "X-Signature"
+
+# Payment states
+PENDING = "pending"
+SUBMITTED = "submitted"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINAL_STATES = (SUCCEEDED, FAILED)
+
+payments_finalised = Counter("payments_finalised_total", "Payments reaching a final state", ("status",))
+payments_reconciled = Counter("payments_reconciled_total", "Stale submitted payments re-queried", ("outcome",))
+gateway_requests = Counter("payment_gateway_requests_total", "Gateway calls by outcome", ("outcome",))
+gateway_duration = Histogram("payment_gateway_request_duration_seconds", "Gateway call time")
+
+class GatewayError(Exception):
+    """A transient gateway failure; the submission is retried."""
+
+class ChargeResult(NamedTuple):
+    reference: str
+    status: str  # submitted, succeeded or failed
+    failure_reason: Optional[str] = None
+
+class PaymentGateway(ABC):
+    """Interface to a card payment provider."""
+
+    @abstractmethod
+    async def create_charge(self, payment: Dict) -> ChargeResult:
+        ...
+
+    async def close(self):
+        pass
+
+class HttpPaymentGateway(PaymentGateway):
+    """JSON-over-HTTP gateway client with a pooled, bounded connection set.
+
+    Connection failures are retried by the transport; timeouts and 5xx
+    responses raise ``GatewayError`` and are retried by the task queue.
+    """
+
+    def __init__(self, base_url: str = PAYMENT_GATEWAY_URL):
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(PAYMENT_GATEWAY_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=PAYMENT_GATEWAY_MAX_CONNECTIONS,
+                max_keepalive_connections=PAYMENT_GATEWAY_MAX_CONNECTIONS
+            ),
+            transport=httpx.AsyncHTTPTransport(retries=PAYMENT_GATEWAY_CONNECT_RETRIES),
+        )
+
+    async def create_charge(self, payment: Dict) -> ChargeResult:
+        body = {
+            "amount": payment["amount"],
+            "currency": payment["currency"],
+            "reference": payment["id"],
+            "callback_url": PAYMENT_CALLBACK_URL,
+        }
+        start = time.perf_counter()
+        try:
+            response = await self.client.post("/charges", json=body, headers={"Idempotency-Key": payment["id"]})
+        except httpx.HTTPError as exc:
+            gateway_requests.inc(outcome="error")
+            raise GatewayError(f"Gateway request failed: {exc!r}") from exc
+        finally:
+            gateway_duration.observe(time.perf_counter() - start)
+
+        if response.status_code >= 500 or response.status_code == 429:
+            gateway_requests.inc(outcome="unavailable")
+            raise GatewayError(f"Gateway answered {response.status_code}")
+        data = response.json()
+        if response.status_code >= 400:
+            gateway_requests.inc(outcome="declined")
+            return ChargeResult(data.get("id", ""), FAILED, data.get("failure_reason", "declined"))
+        gateway_requests.inc(outcome="accepted")
+        status = data.get("status", SUBMITTED)
+        return ChargeResult(data["id"], status if status in FINAL_STATES else SUBMITTED, data.get("failure_reason"))
+
+    async def close(self):
+        await self.client.aclose()
+
+_gateway: Optional[PaymentGateway] = None
+
+def set_gateway(gateway: Optional[PaymentGateway]):
+    global _gateway
+    _gateway = gateway
+
+def get_gateway() -> PaymentGateway:
+    global _gateway
+    if _gateway is None:
+        _gateway = HttpPaymentGateway()
+    return _gateway
+
+def sign_payload(body: bytes, secret: str) -> str:
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+def verify_signature(body: bytes, signature: Optional[str]) -> bool:
+    if not PAYMENT_WEBHOOK_SECRET:
+        logger.error("PAYMENT_WEBHOOK_SECRET is not set; rejecting payment webhook")
+        return False
+    return bool(signature) and hmac.compare_digest(sign_payload(body, PAYMENT_WEBHOOK_SECRET), signature)
+
+def new_payment(booking: Dict) -> Dict:
+    now = datetime.utcnow()
+    return {
+        "id": str(uuid.uuid4()),
+        "booking_id": booking["id"],
+        "user_id": booking["user_id"],
+        "amount": booking["total_price"],
+        "currency": PAYMENT_CURRENCY,
+        "status": PENDING,
+        "open": True,  # At most one open payment per booking (partial unique index)
+        "gateway_reference": None,
+        "failure_reason": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+async def submit_payment(db: AsyncIOMotorDatabase, payment_id: str):
+    """Send a pending payment to the gateway (run by the task queue)."""
+    payment = await db.payments.find_one({"id": payment_id, "status": PENDING})
+    if not payment:
+        return  # Already submitted or finalised
+
+    result = await get_gateway().create_charge(payment)
+    if result.status in FINAL_STATES:
+        await finalise_payment(db, payment_id, result.status, result.reference, result.failure_reason)
+        return
+    await db.payments.update_one(
+        {"id": payment_id, "status": PENDING},
+        {"$set": {"status": SUBMITTED, "gateway_reference": result.reference, "updated_at": datetime.utcnow()}}
+    )
+
+async def finalise_payment(
+    db: AsyncIOMotorDatabase,
+    payment_id: str,
+    status: str,
+    reference: Optional[str] = None,
+    failure_reason: Optional[str] = None
+) -> bool:
+    """Move a payment to its final state and update the booking; returns False if already final."""
+    now = datetime.utcnow()
+    update = {"status": status, "failure_reason": failure_reason, "finalised_at": now, "updated_at": now}
+    if reference:
+        update["gateway_reference"] = reference
+    payment = await db.payments.find_one_and_update(
+        {"id": payment_id, "status": {"$nin": list(FINAL_STATES)}},
+        {"$set": update, "$unset": {"open": ""}}
+    )
+    if not payment:
+        if status == SUCCEEDED:
+            # Expired before the gateway settled it: the money must go back
+            flagged = await db.payments.update_one(
+                {"id": payment_id, "status": FAILED}, {"$set": {"refund_required": True}}
+            )
+            if flagged.modified_count:
+                logger.error("Payment %s succeeded after it was failed; flagging it for refund", payment_id)
+        return False
+
+    query: Dict = {"id": payment["booking_id"], "status": {"$ne": BookingStatus.cancelled}}
+    update: Dict = {"$set": {"updated_at": now}}
+    if status == SUCCEEDED:
+        booking = await db.bookings.find_one(
+            {"id": payment["booking_id"]}, {"_id": 0, "id": 1, "property_id": 1, "total_price": 1, "status": 1}
+        )
+        if booking and booking["status"] == BookingStatus.cancelled:
+            # Cancelled while the charge was in flight: the money must go back
+            logger.error("Payment %s succeeded for cancelled booking %s; flagging it for refund",
+                         payment_id, booking["id"])
+            await db.payments.update_one({"id": payment_id}, {"$set": {"refund_required": True}})
+            payments_finalised.inc(status=status)
+            return True
+        if booking and booking["total_price"] != payment["amount"]:
+            # Repriced after the intent was opened: the charge needs reconciling by hand
+            logger.error("Payment %s charged %s but booking %s now costs %s; not confirming it",
+                         payment_id, payment["amount"], booking["id"], booking["total_price"])
+            await db.payments.update_one({"id": payment_id}, {"$set": {"amount_mismatch": True}})
+            payments_finalised.inc(status=status)
+            return True
+        # Only confirm the booking at the price that was charged
+        query["total_price"] = payment["amount"]
+        update["$set"].update(status=BookingStatus.confirmed, payment_status=PaymentStatus.completed)
+        # The confirmed nights now count in the owner's analytics
+        if booking:
+            update["$push"] = {"outbox": daily_stats_entry(booking)}
+    else:
+        update["$set"]["payment_status"] = PaymentStatus.failed
+    await db.bookings.update_one(query, update)
+    if "$push" in update:
+        task_queue.notify()
+    payments_finalised.inc(status=status)
+    logger.info("Payment %s for booking %s %s", payment_id, payment["booking_id"], status)
+    return True
+
+async def reconcile_payment(db: AsyncIOMotorDatabase, payment: Dict, now: datetime) -> str:
+    """Re-query a submitted payment whose webhook never arrived; returns the outcome.
+
+    The charge is re-sent with the same idempotency key, so the gateway
+    answers with the existing charge instead of charging again.
+    """
+    try:
+        result = await get_gateway().create_charge(payment)
+    except GatewayError:
+        logger.warning("Could not re-query stale payment %s", payment["id"], exc_info=True)
+        result = None
+    if result and result.status in FINAL_STATES:
+        await finalise_payment(db, payment["id"], result.status, result.reference, result.failure_reason)
+        return result.status
+    if payment["created_at"] < now - timedelta(seconds=PAYMENT_EXPIRE_AFTER_SECONDS):
+        logger.error("Payment %s was never settled by the gateway; expiring it", payment["id"])
+        await finalise_payment(db, payment["id"], FAILED, failure_reason="expired")
+        return "expired"
+    return SUBMITTED if result else "error"
+
+async def reconcile_stale_payments(db: AsyncIOMotorDatabase) -> int:
+    """Finalise or expire submitted payments whose webhook is overdue; returns how many were seen."""
+    now = datetime.utcnow()
+    stale = await db.payments.find(
+        {"open": True, "status": SUBMITTED,
+         "updated_at": {"$lt": now - timedelta(seconds=PAYMENT_RECONCILE_AFTER_SECONDS)}}
+    ).sort("updated_at", 1).limit(PAYMENT_RECONCILE_BATCH_SIZE).to_list(PAYMENT_RECONCILE_BATCH_SIZE)
+    for payment in stale:
+        outcome = await reconcile_payment(db, payment, now)
+        payments_reconciled.inc(outcome=outcome)
+        if outcome in (SUBMITTED, "error"):
+            # Still unsettled: look again after another full delay, behind the others
+            await db.payments.update_one(
+                {"id": payment["id"], "status": SUBMITTED}, {"$set": {"updated_at": datetime.utcnow()}}
+            )
+    return len(stale)
+
+async def run_payment_reconciliation(db: AsyncIOMotorDatabase, interval: int = PAYMENT_RECONCILE_INTERVAL_SECONDS):
+    """Periodically recover payments stuck in ``submitted`` (runs until cancelled)."""
+    while True:
+        try:
+            await reconcile_stale_payments(db)
+        except Exception:
+            logger.exception("Payment reconciliation failed")
+        await asyncio.sleep(interval)
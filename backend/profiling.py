@@ -0,0 +1,116 @@
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+from datetime import datetime
+from pathlib import Path
+
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from auth import get_current_user, get_current_active_user
+from models import UserRole
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+PROFILE_DIR = Path(os.environ.get("PROFILE_DIR", "profiles"))
+PROFILE_HEADER = b"x-profile"
+PROFILE_TOP_N = 60
+
+async def _is_admin(scope: Scope) -> bool:
+    authorization = dict(scope["headers"]).get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        user = await get_current_user(HTTPAuthorizationCredentials(scheme=scheme, credentials=token))
+        user = await get_current_active_user(user)
+    except HTTPException:
+        return False
+    return user.role == UserRole.admin
+
+class ProfilingMiddleware:
+    """Profile a single request on demand.
+
+    Admins send ``X-Profile: store`` to save a pstats file under PROFILE_DIR
+    (its name is returned in ``X-Profile-Id``), or ``X-Profile: text`` to get
+    the top functions by cumulative time instead of the normal response.
+    Requests without the header only pay for one header lookup.
+
+    cProfile observes the whole event-loop thread, so requests running
+    concurrently with the profiled one show up in its profile too; only
+    one request is profiled at a time.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._lock = asyncio.Lock()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        mode = None
+        if scope["type"] == "http":
+            mode = dict(scope["headers"]).get(PROFILE_HEADER)
+        if not mode:
+            await self.app(scope, receive, send)
+            return
+
+        mode = mode.decode("latin-1").strip().lower()
+        if mode not in ("store", "text"):
+            await JSONResponse({"detail": "X-Profile must be 'store' or 'text'"}, status_code=400)(scope, receive, send)
+            return
+        if not await _is_admin(scope):
+            await JSONResponse({"detail": "Profiling requires an admin user"}, status_code=403)(scope, receive, send)
+            return
+        if self._lock.locked():
+            await JSONResponse({"detail": "Another request is being profiled"}, status_code=409)(scope, receive, send)
+            return
+
+        async with self._lock:
+            if mode == "text":
+                await self._profile_as_text(scope, receive, send)
+            else:
+                await self._profile_and_store(scope, receive, send)
+
+    async def _profile_and_store(self, scope: Scope, receive: Receive, send: Send):
+        profile_id = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{re.sub(r'[^A-Za-z0-9]+', '_', scope['path']).strip('_')}"
+        profiler = cProfile.Profile()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.disable()
+            PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(PROFILE_DIR / f"{profile_id}.prof")
+            logger.info("Stored request profile %s", profile_id)
+
+    async def _profile_as_text(self, scope: Scope, receive: Receive, send: Send):
+        status_code = None
+
+        async def discard(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            profiler.disable()
+
+        output = io.StringIO()
+        output.write(f"{scope['method']} {scope['path']} -> {status_code}\n\n")
+        pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+        await PlainTextResponse(output.getvalue())(scope, receive, send)
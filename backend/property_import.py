@@ -0,0 +1,226 @@
+"""Bulk property import from NDJSON or CSV.
+
+Rows are read one batch at a time, validated against ``PropertyCreate`` and
+written with one unordered ``bulk_write`` per batch, so memory stays bounded
+by the batch size whatever the input size. Invalid rows and rows the
+database rejects are reported with their row number; the rest of the batch
+is still written.
+
+Rows with an ``external_ref`` are upserted on (owner, external_ref), so the
+same file can be imported again to update listings. Within a batch the
+last row with a given ``external_ref`` wins and the earlier ones are
+reported as duplicates. Rows without one are inserted as new properties.
+
+CSV columns are the ``PropertyCreate`` fields, with the location fields
+(``address``, ``city``, ``region``, ``postal_code``, ``country``,
+``latitude``, ``longitude``) flattened and ``amenities``/``images`` given
+as ``;``-separated lists.
+"""
+import asyncio
+import csv
+import io
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, IO, Iterator, List, NamedTuple, Tuple
+
+import pymongo
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import TypeAdapter, ValidationError
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from categories import categorize_property
+from counters import apply_bulk_property_count_changes
+from models import PropertyCreate
+from streaming import STREAM_BATCH_BUDGET_MS
+from tracing import start_span
+
+# Configuration
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", "500"))
+IMPORT_MAX_REPORTED_ERRORS = int(os.environ.get("IMPORT_MAX_REPORTED_ERRORS", "1000"))
+IMPORT_SPOOL_MAX_MEMORY_BYTES = int(os.environ.get("IMPORT_SPOOL_MAX_MEMORY_BYTES", str(4 * 1024 * 1024)))
+
+FORMATS = ("ndjson", "csv")
+LOCATION_FIELDS = ("address", "city", "region", "postal_code", "country", "latitude", "longitude")
+LIST_SEPARATOR = ";"
+
+# Fields read back to adjust materialized counts when a listing is replaced
+COUNT_PROJECTION = {"_id": 0, "external_ref": 1, "is_active": 1, "categories": 1, "location.region": 1}
+
+_batch_adapter = TypeAdapter(List[PropertyCreate])
+
+class RowError(NamedTuple):
+    row: int
+    errors: List[str]
+
+class ImportReport:
+    def __init__(self):
+        self.processed = 0
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors: List[RowError] = []
+
+    def add_error(self, row: int, errors: List[str]):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_REPORTED_ERRORS:
+            self.errors.append(RowError(row, errors))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "processed": self.processed,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": [error._asdict() for error in self.errors],
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+def _csv_row(row: Dict[str, str]) -> Dict[str, Any]:
+    data: Dict[str, Any] = {k: v for k, v in row.items() if k and v not in (None, "")}
+    location = {field: data.pop(field) for field in LOCATION_FIELDS if field in data}
+    if location:
+        data["location"] = location
+    if "amenities" in data:
+        data["amenities"] = [a.strip() for a in data["amenities"].split(LIST_SEPARATOR) if a.strip()]
+    if "images" in data:
+        data["images"] = [{"url": url.strip()} for url in data["images"].split(LIST_SEPARATOR) if url.strip()]
+    return data
+
+def iter_rows(stream: IO[str], fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Yield ``(row_number, raw_row)``; a raw row that cannot be parsed is an exception instance."""
+    if fmt == "csv":
+        for number, row in enumerate(csv.DictReader(stream), start=1):
+            yield number, _csv_row(row)
+        return
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as exc:
+            yield number, exc
+
+def validate_batch(rows: List[Tuple[int, Any]], report: ImportReport) -> List[Tuple[int, PropertyCreate]]:
+    """Validate a batch in one pydantic-core call; invalid rows are reported and dropped."""
+    valid_rows = []
+    for number, raw in rows:
+        if isinstance(raw, Exception):
+            report.add_error(number, [f"Invalid JSON: {raw}"])
+        elif not isinstance(raw, dict):
+            report.add_error(number, ["Row must be an object"])
+        else:
+            valid_rows.append((number, raw))
+
+    with start_span("pydantic.validate", model="PropertyCreate", count=len(valid_rows)):
+        try:
+            models = _batch_adapter.validate_python([raw for _, raw in valid_rows])
+        except ValidationError as exc:
+            errors_by_index: Dict[int, List[str]] = {}
+            for error in exc.errors():
+                index, *field = error["loc"]
+                errors_by_index.setdefault(index, []).append(
+                    f"{'.'.join(str(part) for part in field) or 'row'}: {error['msg']}"
+                )
+            for index, errors in errors_by_index.items():
+                report.add_error(valid_rows[index][0], errors)
+            valid_rows = [row for index, row in enumerate(valid_rows) if index not in errors_by_index]
+            models = _batch_adapter.validate_python([raw for _, raw in valid_rows])
+    return [(number, model) for (number, _), model in zip(valid_rows, models)]
+
+def drop_duplicate_refs(batch: List[Tuple[int, PropertyCreate]], report: ImportReport) -> List[Tuple[int, PropertyCreate]]:
+    """Keep the last row of each ``external_ref`` in a batch; earlier ones are reported and dropped."""
+    last_rows = {model.external_ref: number for number, model in batch if model.external_ref}
+    kept = []
+    for number, model in batch:
+        last_row = last_rows.get(model.external_ref)
+        if last_row is not None and last_row != number:
+            report.add_error(number, [f"external_ref: repeated on row {last_row}, which was imported instead"])
+        else:
+            kept.append((number, model))
+    return kept
+
+async def write_batch(
+    db: AsyncIOMotorDatabase,
+    owner_id: str,
+    batch: List[Tuple[int, PropertyCreate]],
+    report: ImportReport
+):
+    now = datetime.utcnow()
+    refs = [model.external_ref for _, model in batch if model.external_ref]
+    existing = {}
+    if refs:
+        # Each batch gets its own read budget; its writes are never cut short
+        with pymongo.timeout(STREAM_BATCH_BUDGET_MS / 1000):
+            docs = await db.properties.find(
+                {"owner_id": owner_id, "external_ref": {"$in": refs}}, COUNT_PROJECTION
+            ).to_list(None)
+        existing = {doc["external_ref"]: doc for doc in docs}
+
+    operations, changes = [], []
+    for _, model in batch:
+        fields = model.model_dump()
+        fields["categories"] = categorize_property(fields)
+        if model.external_ref:
+            operations.append(UpdateOne(
+                {"owner_id": owner_id, "external_ref": model.external_ref},
+                {
+                    "$set": {**fields, "updated_at": now},
+                    "$setOnInsert": {
+                        "id": str(uuid.uuid4()), "owner_id": owner_id, "is_active": True,
+                        "average_rating": None, "review_count": 0, "created_at": now,
+                    },
+                },
+                upsert=True
+            ))
+            before = existing.get(model.external_ref)
+            changes.append((before, {**fields, "is_active": before.get("is_active", True) if before else True}))
+        else:
+            operations.append(InsertOne({
+                **fields, "id": str(uuid.uuid4()), "owner_id": owner_id, "is_active": True,
+                "average_rating": None, "review_count": 0, "created_at": now, "updated_at": None,
+            }))
+            changes.append((None, {**fields, "is_active": True}))
+
+    try:
+        result = (await db.properties.bulk_write(operations, ordered=False)).bulk_api_result
+    except BulkWriteError as exc:
+        result = exc.details
+        for error in result["writeErrors"]:
+            report.add_error(batch[error["index"]][0], [error["errmsg"]])
+        failed = {error["index"] for error in result["writeErrors"]}
+        changes = [change for index, change in enumerate(changes) if index not in failed]
+
+    report.inserted += result["nInserted"] + result["nUpserted"]
+    report.updated += result["nModified"]
+    await apply_bulk_property_count_changes(db, changes)
+
+async def import_properties(db: AsyncIOMotorDatabase, owner_id: str, stream: IO[str], fmt: str) -> ImportReport:
+    """Import every row of a text stream for one owner."""
+    report = ImportReport()
+    rows = iter_rows(stream, fmt)
+    while True:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                break
+        if not batch:
+            return report
+        report.processed += len(batch)
+        valid = drop_duplicate_refs(validate_batch(batch, report), report)
+        if valid:
+            await write_batch(db, owner_id, valid, report)
+        # Parsing and validation are CPU-bound; let other requests run between batches
+        await asyncio.sleep(0)
+
+async def spool_request_body(chunks: AsyncIterator[bytes], spool: IO[bytes]):
+    """Copy a request body to a spooled file (kept in memory up to its max size)."""
+    async for chunk in chunks:
+        spool.write(chunk)
+    spool.seek(0)
+
+def text_stream(spool: IO[bytes]) -> IO[str]:
+    return io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
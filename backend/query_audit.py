@@ -0,0 +1,114 @@
+import logging
+import os
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from pymongo import monitoring
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from db_monitoring import command_collection
+
+logger = logging.getLogger(__name__)
+
+# Configuration: "off", "log" (development/staging) or "strict" (tests)
+QUERY_AUDIT_MODE = os.environ.get("QUERY_AUDIT_MODE", "off").lower()
+QUERY_AUDIT_MAX_COMMANDS = int(os.environ.get("QUERY_AUDIT_MAX_COMMANDS", "20"))
+QUERY_AUDIT_MAX_DB_MS = float(os.environ.get("QUERY_AUDIT_MAX_DB_MS", "200"))
+
+def query_audit_enabled() -> bool:
+    return QUERY_AUDIT_MODE in ("log", "strict")
+
+class QueryBudgetExceeded(Exception):
+    """Raised in strict mode when a request exceeds its query budget."""
+
+class RequestQueryLog:
+    """Mongo commands issued while handling one request.
+
+    Commands run on Motor's executor threads, which inherit the request's
+    context, so updates are guarded by a lock.
+    """
+
+    def __init__(self):
+        self.shapes: Counter = Counter()
+        self.total_micros = 0
+        self._pending: Dict[Tuple, str] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def command_count(self) -> int:
+        return sum(self.shapes.values())
+
+    @property
+    def total_ms(self) -> float:
+        return self.total_micros / 1000
+
+    def started(self, key: Tuple, shape: str):
+        with self._lock:
+            self._pending[key] = shape
+
+    def finished(self, key: Tuple, duration_micros: int):
+        with self._lock:
+            shape = self._pending.pop(key, "unknown")
+            self.shapes[shape] += 1
+            self.total_micros += duration_micros
+
+    def summary(self) -> str:
+        return ", ".join(f"{shape} ×{count}" for shape, count in self.shapes.most_common())
+
+current_query_log: ContextVar[Optional[RequestQueryLog]] = ContextVar("current_query_log", default=None)
+
+class QueryAuditListener(monitoring.CommandListener):
+    """Attribute each Mongo command to the request that issued it."""
+
+    def started(self, event):
+        query_log = current_query_log.get()
+        if query_log is not None:
+            collection = command_collection(event.command_name, event.command)
+            query_log.started((event.connection_id, event.request_id), f"{collection}.{event.command_name}")
+
+    def _finished(self, event):
+        query_log = current_query_log.get()
+        if query_log is not None:
+            query_log.finished((event.connection_id, event.request_id), event.duration_micros)
+
+    def succeeded(self, event):
+        self._finished(event)
+
+    def failed(self, event):
+        self._finished(event)
+
+class QueryAuditMiddleware:
+    """Flag requests that issue too many Mongo commands or spend too long in the database."""
+
+    def __init__(self, app: ASGIApp, max_commands: int = QUERY_AUDIT_MAX_COMMANDS,
+                 max_db_ms: float = QUERY_AUDIT_MAX_DB_MS, strict: bool = QUERY_AUDIT_MODE == "strict"):
+        self.app = app
+        self.max_commands = max_commands
+        self.max_db_ms = max_db_ms
+        self.strict = strict
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        query_log = RequestQueryLog()
+        token = current_query_log.set(query_log)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_query_log.reset(token)
+
+        if query_log.command_count <= self.max_commands and query_log.total_ms <= self.max_db_ms:
+            return
+
+        route = scope.get("route")
+        message = (
+            f"{scope['method']} {scope['path']} ({getattr(route, 'name', 'unmatched')}) issued "
+            f"{query_log.command_count} Mongo commands taking {query_log.total_ms:.1f} ms: {query_log.summary()}"
+        )
+        logger.warning(message)
+        if self.strict:
+            raise QueryBudgetExceeded(message)
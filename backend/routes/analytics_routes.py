@@ -0,0 +1,95 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import List, Optional, Tuple
+from datetime import date
+
+from models import User, UserRole
+from auth import get_current_active_user
+from database import get_database
+from analytics import monthly_metrics, next_month
+
+router = APIRouter(prefix="/api/analytics", tags=["analytics"])
+
+PROPERTY_PROJECTION = {"_id": 0, "id": 1, "name": 1, "owner_id": 1}
+
+def _require_owner(current_user: User):
+    if current_user.role not in [UserRole.owner, UserRole.admin]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only property owners can view analytics"
+        )
+
+def _month_range(start: Optional[date], end: Optional[date]) -> Tuple[date, date]:
+    """Default to the last 12 months, including the current one."""
+    this_month = date.today().replace(day=1)
+    end = end or next_month(this_month)
+    start = start or next_month(this_month.replace(year=this_month.year - 1))
+    if end <= start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end must be after start"
+        )
+    return start, end
+
+async def _analytics_response(
+    db: AsyncIOMotorDatabase,
+    properties: List[dict],
+    start: date,
+    end: date
+) -> dict:
+    metrics = await monthly_metrics(db, [prop["id"] for prop in properties], start, end)
+    return {
+        "start": start,
+        "end": end,
+        "properties": [
+            {"property_id": prop["id"], "name": prop["name"], "months": metrics[prop["id"]]}
+            for prop in properties
+        ],
+    }
+
+@router.get("/properties")
+async def get_owner_analytics(
+    start: Optional[date] = Query(None, description="First night included (default: 12 months ago)"),
+    end: Optional[date] = Query(None, description="Night to stop before (default: end of this month)"),
+    owner_id: Optional[str] = Query(None, description="Another owner's properties (admins only)"),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Monthly occupancy, revenue, ADR and lead time of the owner's properties"""
+    _require_owner(current_user)
+    if owner_id and owner_id != current_user.id and current_user.role != UserRole.admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only view analytics of your own properties"
+        )
+
+    start, end = _month_range(start, end)
+    properties = await db.properties.find(
+        {"owner_id": owner_id or current_user.id}, PROPERTY_PROJECTION
+    ).sort("name", 1).to_list(None)
+    return await _analytics_response(db, properties, start, end)
+
+@router.get("/properties/{property_id}")
+async def get_property_analytics(
+    property_id: str,
+    start: Optional[date] = Query(None, description="First night included (default: 12 months ago)"),
+    end: Optional[date] = Query(None, description="Night to stop before (default: end of this month)"),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Monthly occupancy, revenue, ADR and lead time of one property (owner or admin only)"""
+    _require_owner(current_user)
+    property_data = await db.properties.find_one({"id": property_id}, PROPERTY_PROJECTION)
+    if not property_data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Property not found"
+        )
+    if current_user.role != UserRole.admin and property_data["owner_id"] != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only view analytics of your own properties"
+        )
+
+    start, end = _month_range(start, end)
+    return await _analytics_response(db, [property_data], start, end)
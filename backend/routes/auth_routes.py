@@ -13,6 +13,7 @@ from auth import (
     get_current_active_user, create_session
 )
 from database import get_database
+from deadlines import read_deadline
 
 router = APIRouter(prefix="/api/auth", tags=["authentication"])
 
@@ -47,7 +48,8 @@ async def login(
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Login user and return access token"""
-    user = await authenticate_user(db, login_data.email, login_data.password)
+    with read_deadline():
+        user = await authenticate_user(db, login_data.email, login_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from typing import List, Optional
 
 from models import BlogPost, BlogPostResponse, User
 from auth import get_current_active_user
-from database import get_database
+from database import get_read_database
+from http_cache import document_validators, conditional_response
 
 router = APIRouter(prefix="/api/blog", tags=["blog"])
 
@@ -13,7 +14,7 @@ async def list_blog_posts(
     published: bool = Query(True, description="Filter by published status"),
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=50),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    db: AsyncIOMotorDatabase = Depends(get_read_database)
 ):
     """Get list of blog posts"""
     filter_query = {}
@@ -44,14 +45,16 @@ async def list_blog_posts(
                     created_at=author_data["created_at"]
                 )
         
-        posts.append(BlogPostResponse(**post.dict(), author=author))
+        posts.append(BlogPostResponse(**post.model_dump(), author=author))
     
     return posts
 
 @router.get("/posts/{slug}", response_model=BlogPostResponse)
 async def get_blog_post(
     slug: str,
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    request: Request,
+    response: Response,
+    db: AsyncIOMotorDatabase = Depends(get_read_database)
 ):
     """Get single blog post by slug"""
     post_data = await db.blog_posts.find_one({"slug": slug, "published": True})
@@ -61,21 +64,30 @@ async def get_blog_post(
             detail="Blog post not found"
         )
     
-    post = BlogPost(**post_data)
-    
     # Get author info
+    author_data = None
+    if post_data.get("author_id"):
+        author_data = await db.users.find_one(
+            {"id": post_data["author_id"]},
+            {"_id": 0, "password_hash": 0}
+        )
+    
+    # Answer revalidations before building the response models
+    not_modified = conditional_response(request, response, document_validators(post_data, author_data))
+    if not_modified:
+        return not_modified
+    
+    post = BlogPost(**post_data)
     author = None
-    if post.author_id:
-        author_data = await db.users.find_one({"id": post.author_id})
-        if author_data:
-            from models import UserResponse
-            author = UserResponse(
-                id=author_data["id"],
-                email=author_data["email"],
-                first_name=author_data["first_name"],
-                last_name=author_data["last_name"],
-                role=author_data["role"],
-                created_at=author_data["created_at"]
-            )
+    if author_data:
+        from models import UserResponse
+        author = UserResponse(
+            id=author_data["id"],
+            email=author_data["email"],
+            first_name=author_data["first_name"],
+            last_name=author_data["last_name"],
+            role=author_data["role"],
+            created_at=author_data["created_at"]
+        )
     
-    return BlogPostResponse(**post.dict(), author=author)
\ No newline at end of file
+    return BlogPostResponse(**post.model_dump(), author=author)
\ No newline at end of file
@@ -1,17 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from pymongo.errors import DuplicateKeyError
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import List
+from typing import List, Optional
 from datetime import datetime, date
+from functools import partial
+import tempfile
 
 from models import (
     Booking, BookingCreate, BookingUpdate, BookingResponse,
-    User, BookingStatus, PaymentStatus, Property
+    User, UserRole, BookingStatus, PaymentStatus, Property
 )
 from auth import get_current_active_user
 from database import get_database
+from deadlines import read_deadline
+from streaming import wants_ndjson, ndjson_response
+from serialization import validate_properties
+from tracing import start_span, traced
+from payments import PENDING, new_payment
+from task_queue import task_queue, outbox_entry
+from tasks import SUBMIT_PAYMENT, payment_task_key
+from analytics import COUNTED_STATUSES, daily_stats_entry
+from archive import find_booking, user_bookings_pipeline
+from booking_dates import MAX_BOOKING_NIGHTS, from_storage_date, overlap_filter, to_storage_date
+from booking_export import (
+    EXPORT_CHUNK_BYTES, EXPORT_SPOOL_MAX_MEMORY_BYTES, FORMATS as EXPORT_FORMATS,
+    MEDIA_TYPES as EXPORT_MEDIA_TYPES, iter_csv, iter_export_frames, write_parquet
+)
 
 router = APIRouter(prefix="/api/bookings", tags=["bookings"])
 
+@traced("check_property_availability")
 async def check_property_availability(
     db: AsyncIOMotorDatabase,
     property_id: str,
@@ -19,13 +38,11 @@ async def check_property_availability(
     check_out: date,
     exclude_booking_id: str = None
 ) -> bool:
-    """Check if property is available for given dates"""
+    """Check if property is available for the nights [check_in, check_out)"""
     filter_query = {
         "property_id": property_id,
         "status": {"$in": ["confirmed", "pending"]},
-        "$or": [
-            {"check_in": {"$lte": check_out}, "check_out": {"$gte": check_in}}
-        ]
+        **overlap_filter(check_in, check_out)
     }
     
     if exclude_booking_id:
@@ -34,6 +51,7 @@ async def check_property_availability(
     conflicting_booking = await db.bookings.find_one(filter_query)
     return conflicting_booking is None
 
+@traced("calculate_booking_price")
 async def calculate_booking_price(
     db: AsyncIOMotorDatabase,
     property_id: str,
@@ -54,6 +72,11 @@ async def calculate_booking_price(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Check-out must be after check-in"
         )
+    if nights > MAX_BOOKING_NIGHTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Stays are limited to {MAX_BOOKING_NIGHTS} nights"
+        )
     
     price_per_night = property_data["price_per_night"]
     
@@ -70,10 +93,11 @@ async def create_booking(
 ):
     """Create a new booking"""
     # Verify property exists and is active
-    property_data = await db.properties.find_one({
-        "id": booking_data.property_id,
-        "is_active": True
-    })
+    with read_deadline():
+        property_data = await db.properties.find_one({
+            "id": booking_data.property_id,
+            "is_active": True
+        })
     if not property_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -88,9 +112,10 @@ async def create_booking(
         )
     
     # Check availability
-    is_available = await check_property_availability(
-        db, booking_data.property_id, booking_data.check_in, booking_data.check_out
-    )
+    with read_deadline():
+        is_available = await check_property_availability(
+            db, booking_data.property_id, booking_data.check_in, booking_data.check_out
+        )
     if not is_available:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -98,45 +123,108 @@ async def create_booking(
         )
     
     # Calculate total price
-    total_price = await calculate_booking_price(
-        db, booking_data.property_id, booking_data.check_in, booking_data.check_out
-    )
+    with read_deadline():
+        total_price = await calculate_booking_price(
+            db, booking_data.property_id, booking_data.check_in, booking_data.check_out
+        )
     
     # Create booking
-    booking = Booking(
-        **booking_data.dict(),
-        user_id=current_user.id,
-        total_price=total_price
-    )
+    with start_span("pydantic.validate", model="Booking"):
+        booking = Booking(
+            **booking_data.model_dump(),
+            user_id=current_user.id,
+            total_price=total_price
+        )
     
-    await db.bookings.insert_one(booking.dict())
+    booking_doc = booking.model_dump()
+    booking_doc["check_in"] = to_storage_date(booking.check_in)
+    booking_doc["check_out"] = to_storage_date(booking.check_out)
+    await db.bookings.insert_one(booking_doc)
     
     # Return booking with property details
     property_obj = Property(**property_data)
-    return BookingResponse(**booking.dict(), property=property_obj)
+    return BookingResponse(**booking.model_dump(), property=property_obj)
+
+async def render_bookings(db: AsyncIOMotorDatabase, bookings_data: List[dict]) -> List[BookingResponse]:
+    """Build booking responses for a batch, enriched with one property lookup"""
+    property_ids = list({booking_data["property_id"] for booking_data in bookings_data})
+    properties_data = await db.properties.find({"id": {"$in": property_ids}}).to_list(None)
+    properties = {prop.id: prop for prop in validate_properties(properties_data)}
+    
+    bookings = []
+    with start_span("pydantic.validate", model="BookingResponse", count=len(bookings_data)):
+        for booking_data in bookings_data:
+            booking = Booking(**booking_data)
+            bookings.append(BookingResponse(**booking.model_dump(), property=properties.get(booking.property_id)))
+    return bookings
 
 @router.get("", response_model=List[BookingResponse])
 async def list_user_bookings(
+    request: Request,
     current_user: User = Depends(get_current_active_user),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    """Get current user's bookings"""
-    bookings_data = await db.bookings.find({
-        "user_id": current_user.id
-    }).sort("created_at", -1).to_list(None)
+    """Get current user's bookings, archived ones included (streamed with Accept: application/x-ndjson)"""
+    cursor = db.bookings.aggregate(user_bookings_pipeline(current_user.id))
     
-    # Enrich with property data
-    bookings = []
-    for booking_data in bookings_data:
-        booking = Booking(**booking_data)
-        
-        # Get property info
-        property_data = await db.properties.find_one({"id": booking.property_id})
-        property_obj = Property(**property_data) if property_data else None
-        
-        bookings.append(BookingResponse(**booking.dict(), property=property_obj))
+    if wants_ndjson(request):
+        return ndjson_response(cursor, partial(render_bookings, db))
     
-    return bookings
+    return await render_bookings(db, await cursor.to_list(None))
+
+@router.get("/export")
+async def export_bookings_route(
+    start: date = Query(..., description="First creation date included"),
+    end: date = Query(..., description="Creation date to stop before"),
+    format: str = Query("csv", description="csv or parquet"),
+    booking_status: Optional[List[BookingStatus]] = Query(None, alias="status"),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Export bookings created in [start, end) with property and guest details (admin only)"""
+    if current_user.role != UserRole.admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can export bookings"
+        )
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Format must be one of: {', '.join(EXPORT_FORMATS)}"
+        )
+    if end <= start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end must be after start"
+        )
+
+    start_at = datetime.combine(start, datetime.min.time())
+    end_at = datetime.combine(end, datetime.min.time())
+    statuses = [s.value for s in booking_status] if booking_status else None
+    headers = {"Content-Disposition": f'attachment; filename="bookings-{start}-{end}.{format}"'}
+    frames = iter_export_frames(db, start_at, end_at, statuses)
+
+    if format == "csv":
+        return StreamingResponse(iter_csv(frames), media_type=EXPORT_MEDIA_TYPES[format], headers=headers)
+
+    # Parquet needs its footer written last: build the file (on disk past the
+    # spool threshold) row group by row group, then stream it out
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_MEMORY_BYTES)
+    try:
+        await write_parquet(frames, spool)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+
+    async def iter_file():
+        try:
+            while chunk := spool.read(EXPORT_CHUNK_BYTES):
+                yield chunk
+        finally:
+            spool.close()
+
+    return StreamingResponse(iter_file(), media_type=EXPORT_MEDIA_TYPES[format], headers=headers)
 
 @router.get("/{booking_id}", response_model=BookingResponse)
 async def get_booking(
@@ -144,8 +232,8 @@ async def get_booking(
     current_user: User = Depends(get_current_active_user),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    """Get single booking by ID"""
-    booking_data = await db.bookings.find_one({"id": booking_id})
+    """Get single booking by ID (archived bookings included)"""
+    booking_data = await find_booking(db, {"id": booking_id})
     if not booking_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -166,7 +254,7 @@ async def get_booking(
     property_data = await db.properties.find_one({"id": booking.property_id})
     property_obj = Property(**property_data) if property_data else None
     
-    return BookingResponse(**booking.dict(), property=property_obj)
+    return BookingResponse(**booking.model_dump(), property=property_obj)
 
 @router.put("/{booking_id}", response_model=BookingResponse)
 async def update_booking(
@@ -176,7 +264,8 @@ async def update_booking(
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Update booking (only if not confirmed yet)"""
-    booking_data = await db.bookings.find_one({"id": booking_id})
+    with read_deadline():
+        booking_data = await db.bookings.find_one({"id": booking_id})
     if not booking_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -199,19 +288,29 @@ async def update_booking(
     
     # Prepare update data
     update_data = {}
-    for field, value in updates.dict(exclude_unset=True).items():
+    for field, value in updates.model_dump(exclude_unset=True).items():
         if value is not None:
             update_data[field] = value
     
     # If dates are being updated, check availability and recalculate price
     if "check_in" in update_data or "check_out" in update_data:
-        new_check_in = update_data.get("check_in", booking_data["check_in"])
-        new_check_out = update_data.get("check_out", booking_data["check_out"])
+        new_check_in = update_data.get("check_in", from_storage_date(booking_data["check_in"]))
+        new_check_out = update_data.get("check_out", from_storage_date(booking_data["check_out"]))
+        
+        # The open payment charges the current price, so it must not change under it
+        with read_deadline():
+            open_payment = await db.payments.find_one({"booking_id": booking_id, "open": True}, {"_id": 1})
+        if open_payment:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Cannot change the dates while a payment is in progress"
+            )
         
         # Check availability (exclude current booking)
-        is_available = await check_property_availability(
-            db, booking_data["property_id"], new_check_in, new_check_out, booking_id
-        )
+        with read_deadline():
+            is_available = await check_property_availability(
+                db, booking_data["property_id"], new_check_in, new_check_out, booking_id
+            )
         if not is_available:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
@@ -219,17 +318,23 @@ async def update_booking(
             )
         
         # Recalculate price
-        new_total_price = await calculate_booking_price(
-            db, booking_data["property_id"], new_check_in, new_check_out
-        )
+        with read_deadline():
+            new_total_price = await calculate_booking_price(
+                db, booking_data["property_id"], new_check_in, new_check_out
+            )
         update_data["total_price"] = new_total_price
+        update_data["check_in"] = to_storage_date(new_check_in)
+        update_data["check_out"] = to_storage_date(new_check_out)
     
     if update_data:
         update_data["updated_at"] = datetime.utcnow()
-        await db.bookings.update_one(
-            {"id": booking_id},
-            {"$set": update_data}
-        )
+        update = {"$set": update_data}
+        if "total_price" in update_data and booking_data["status"] in COUNTED_STATUSES:
+            previous_dates = (booking_data["check_in"], booking_data["check_out"])
+            update["$push"] = {"outbox": daily_stats_entry(booking_data, previous_dates)}
+        await db.bookings.update_one({"id": booking_id}, update)
+        if "$push" in update:
+            task_queue.notify()
     
     # Return updated booking
     updated_data = await db.bookings.find_one({"id": booking_id})
@@ -239,7 +344,7 @@ async def update_booking(
     property_data = await db.properties.find_one({"id": booking.property_id})
     property_obj = Property(**property_data) if property_data else None
     
-    return BookingResponse(**booking.dict(), property=property_obj)
+    return BookingResponse(**booking.model_dump(), property=property_obj)
 
 @router.delete("/{booking_id}")
 async def cancel_booking(
@@ -248,7 +353,8 @@ async def cancel_booking(
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Cancel a booking"""
-    booking_data = await db.bookings.find_one({"id": booking_id})
+    with read_deadline():
+        booking_data = await db.bookings.find_one({"id": booking_id})
     if not booking_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -262,14 +368,26 @@ async def cancel_booking(
             detail="You can only cancel your own bookings"
         )
     
+    # A charge in flight would otherwise succeed against a cancelled booking
+    with read_deadline():
+        open_payment = await db.payments.find_one({"booking_id": booking_id, "open": True}, {"_id": 1})
+    if open_payment:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Cannot cancel the booking while a payment is in progress"
+        )
+    
     # Update booking status
-    await db.bookings.update_one(
-        {"id": booking_id},
-        {"$set": {
-            "status": BookingStatus.cancelled,
-            "updated_at": datetime.utcnow()
-        }}
-    )
+    update = {"$set": {
+        "status": BookingStatus.cancelled,
+        "updated_at": datetime.utcnow()
+    }}
+    if booking_data["status"] in COUNTED_STATUSES:
+        # The freed nights no longer count in the owner's analytics
+        update["$push"] = {"outbox": daily_stats_entry(booking_data)}
+    await db.bookings.update_one({"id": booking_id}, update)
+    if "$push" in update:
+        task_queue.notify()
     
     return {"message": "Booking cancelled successfully"}
 
@@ -279,8 +397,9 @@ async def process_payment(
     current_user: User = Depends(get_current_active_user),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    """Process payment for booking (mock implementation)"""
-    booking_data = await db.bookings.find_one({"id": booking_id})
+    """Start paying for a booking; the result arrives asynchronously (poll GET /api/payments/{id})"""
+    with read_deadline():
+        booking_data = await db.bookings.find_one({"id": booking_id})
     if not booking_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -294,21 +413,47 @@ async def process_payment(
             detail="You can only pay for your own bookings"
         )
     
-    # Mock payment processing
-    # In real implementation, integrate with payment gateway (Stripe, PayPal, etc.)
+    if booking_data["status"] == BookingStatus.cancelled:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot pay for a cancelled booking"
+        )
+    if booking_data["payment_status"] == PaymentStatus.completed:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Booking is already paid"
+        )
     
-    # Update booking status
-    await db.bookings.update_one(
-        {"id": booking_id},
-        {"$set": {
-            "status": BookingStatus.confirmed,
-            "payment_status": PaymentStatus.completed,
-            "updated_at": datetime.utcnow()
-        }}
+    # Reuse the open payment when the request is repeated
+    with read_deadline():
+        payment = await db.payments.find_one({"booking_id": booking_id, "open": True})
+    if payment:
+        if payment["status"] == PENDING:
+            # Resubmit in case earlier attempts were exhausted
+            await task_queue.enqueue(db, SUBMIT_PAYMENT, {"payment_id": payment["id"]}, payment_task_key(payment["id"]))
+    else:
+        payment = new_payment(booking_data)
+        # The gateway submission is queued in the same write as the intent
+        payment["outbox"] = [
+            outbox_entry(SUBMIT_PAYMENT, {"payment_id": payment["id"]}, payment_task_key(payment["id"]))
+        ]
+        try:
+            await db.payments.insert_one(payment)
+        except DuplicateKeyError:
+            # A concurrent request opened one first
+            payment = await db.payments.find_one({"booking_id": booking_id, "open": True})
+        await db.bookings.update_one(
+            {"id": booking_id, "payment_status": {"$ne": PaymentStatus.completed}},
+            {"$set": {"payment_status": PaymentStatus.processing, "updated_at": datetime.utcnow()}}
+        )
+        task_queue.notify()
+    
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            "message": "Payment is being processed",
+            "booking_id": booking_id,
+            "payment_id": payment["id"] if payment else None,
+            "status": PaymentStatus.processing.value
+        }
     )
-    
-    return {
-        "message": "Payment processed successfully",
-        "booking_id": booking_id,
-        "status": "confirmed"
-    }
\ No newline at end of file
@@ -1,47 +1,82 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from typing import List
 
-from models import InspirationCategory, SpecialOffer
-from database import get_database
+from models import InspirationCategory, SpecialOffer, Property
+from database import get_read_database
+from offers_cache import offer_cache
+from http_cache import collection_validators, conditional_response, cache_headers
+from serialization import validate_properties, property_list_adapter, json_response
+from coalescing import single_flight
+from home_bundle import home_bundle
 
 router = APIRouter(prefix="/api", tags=["content"])
 
+@router.get("/home")
+async def get_home(
+    request: Request,
+    response: Response,
+    db: AsyncIOMotorDatabase = Depends(get_read_database)
+):
+    """Get everything the homepage renders in one response"""
+    # Pre-serialised and rebuilt in the background when content changes
+    body, validators = await home_bundle.get(db)
+    not_modified = conditional_response(request, response, validators)
+    if not_modified:
+        return not_modified
+    return Response(content=body, media_type="application/json", headers=cache_headers(validators))
+
 @router.get("/inspiration", response_model=List[InspirationCategory])
 async def get_inspiration_categories(
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    request: Request,
+    response: Response,
+    db: AsyncIOMotorDatabase = Depends(get_read_database)
 ):
     """Get all inspiration categories"""
+    validators = await single_flight.do(
+        ("inspiration", "validators"), lambda: collection_validators(db.inspiration_categories)
+    )
+    not_modified = conditional_response(request, response, validators)
+    if not_modified:
+        return not_modified
+    
+    return await single_flight.do(("inspiration",), lambda: _load_inspiration_categories(db))
+
+async def _load_inspiration_categories(db: AsyncIOMotorDatabase) -> List[InspirationCategory]:
+    # Property counts are materialized on the category documents
     categories_data = await db.inspiration_categories.find({}).to_list(None)
+    return [InspirationCategory(**cat_data) for cat_data in categories_data]
+
+@router.get("/inspiration/{slug}/properties", response_model=List[Property])
+async def get_inspiration_properties(
+    slug: str,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncIOMotorDatabase = Depends(get_read_database)
+):
+    """Get active properties in an inspiration category"""
+    category = await db.inspiration_categories.find_one({"slug": slug}, {"_id": 1})
+    if not category:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Inspiration category not found"
+        )
     
-    # Update property counts for each category
-    categories = []
-    for cat_data in categories_data:
-        # Count properties that match this category
-        # This is a simplified matching - in real implementation, 
-        # you'd have proper category-to-property relationships
-        property_count = await db.properties.count_documents({"is_active": True})
-        
-        cat_data["property_count"] = property_count // 4  # Distribute roughly
-        categories.append(InspirationCategory(**cat_data))
+    # Membership is precomputed into the indexed ``categories`` array
+    cursor = db.properties.find({"categories": slug, "is_active": True}).skip(skip).limit(limit)
+    properties_data = await cursor.to_list(limit)
     
-    return categories
+    return json_response(property_list_adapter, validate_properties(properties_data))
 
 @router.get("/special-offers", response_model=List[SpecialOffer])
 async def get_special_offers(
     active_only: bool = True,
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    db: AsyncIOMotorDatabase = Depends(get_read_database)
 ):
     """Get current special offers"""
-    from datetime import datetime
-    
-    filter_query = {}
     if active_only:
-        filter_query.update({
-            "active": True,
-            "valid_from": {"$lte": datetime.utcnow()},
-            "valid_until": {"$gte": datetime.utcnow()}
-        })
-    
-    offers_data = await db.special_offers.find(filter_query).to_list(None)
+        # Served from the in-memory offer set, refreshed at validity boundaries
+        offers_data = await offer_cache.get_active_offers(db)
+    else:
+        offers_data = await db.special_offers.find({}).to_list(None)
     return [SpecialOffer(**offer) for offer in offers_data]
\ No newline at end of file
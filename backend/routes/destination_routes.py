@@ -1,37 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from typing import List
 
 from models import Destination, Property
-from database import get_database
+from database import get_read_database
+from http_cache import collection_validators, conditional_response
+from streaming import wants_ndjson, ndjson_response
+from serialization import validate_properties, property_list_adapter, json_response
+from coalescing import single_flight
 
 router = APIRouter(prefix="/api/destinations", tags=["destinations"])
 
 @router.get("", response_model=List[Destination])
 async def list_destinations(
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    request: Request,
+    response: Response,
+    db: AsyncIOMotorDatabase = Depends(get_read_database)
 ):
     """Get all destinations"""
-    destinations_data = await db.destinations.find({}).to_list(None)
-    
-    # Update property counts
-    destinations = []
-    for dest_data in destinations_data:
-        # Count active properties in this region
-        property_count = await db.properties.count_documents({
-            "location.region": {"$regex": dest_data["name"], "$options": "i"},
-            "is_active": True
-        })
-        
-        dest_data["property_count"] = property_count
-        destinations.append(Destination(**dest_data))
+    validators = await single_flight.do(
+        ("destinations", "validators"), lambda: collection_validators(db.destinations)
+    )
+    not_modified = conditional_response(request, response, validators)
+    if not_modified:
+        return not_modified
     
-    return destinations
+    return await single_flight.do(("destinations",), lambda: _load_destinations(db))
+
+async def _load_destinations(db: AsyncIOMotorDatabase) -> List[Destination]:
+    # Property counts are materialized on the destination documents
+    destinations_data = await db.destinations.find({}).to_list(None)
+    return [Destination(**dest_data) for dest_data in destinations_data]
 
 @router.get("/{slug}", response_model=Destination)
 async def get_destination(
     slug: str,
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    db: AsyncIOMotorDatabase = Depends(get_read_database)
 ):
     """Get destination by slug"""
     destination_data = await db.destinations.find_one({"slug": slug})
@@ -41,21 +45,15 @@ async def get_destination(
             detail="Destination not found"
         )
     
-    # Update property count
-    property_count = await db.properties.count_documents({
-        "location.region": {"$regex": destination_data["name"], "$options": "i"},
-        "is_active": True
-    })
-    destination_data["property_count"] = property_count
-    
     return Destination(**destination_data)
 
 @router.get("/{slug}/properties", response_model=List[Property])
 async def get_destination_properties(
     slug: str,
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_read_database)
 ):
-    """Get all properties in a destination"""
+    """Get all properties in a destination (streamed with Accept: application/x-ndjson)"""
     # Get destination
     destination_data = await db.destinations.find_one({"slug": slug})
     if not destination_data:
@@ -65,9 +63,16 @@ async def get_destination_properties(
         )
     
     # Get properties in this region
-    properties_data = await db.properties.find({
+    cursor = db.properties.find({
         "location.region": {"$regex": destination_data["name"], "$options": "i"},
         "is_active": True
-    }).to_list(None)
+    })
     
-    return [Property(**prop) for prop in properties_data]
\ No newline at end of file
+    if wants_ndjson(request):
+        return ndjson_response(cursor, render_properties)
+    
+    return json_response(property_list_adapter, await render_properties(await cursor.to_list(None)))
+
+async def render_properties(properties_data: List[dict]) -> List[Property]:
+    """Build property response models for a batch of documents"""
+    return validate_properties(properties_data)
\ No newline at end of file
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, status
+from fastapi.responses import JSONResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+import asyncio
+import os
+import time
+
+from database import get_database, MONGO_MAX_POOL_SIZE
+from db_monitoring import mongo_pool_checked_out
+
+# Readiness thresholds
+HEALTH_PING_TIMEOUT_SECONDS = float(os.environ.get("HEALTH_PING_TIMEOUT_SECONDS", "1.0"))
+HEALTH_MAX_PING_MS = float(os.environ.get("HEALTH_MAX_PING_MS", "250"))
+HEALTH_MAX_POOL_UTILIZATION = float(os.environ.get("HEALTH_MAX_POOL_UTILIZATION", "0.9"))
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+@router.get("/live")
+async def liveness():
+    """Liveness probe: the worker is up and serving its event loop"""
+    return {"status": "alive"}
+
+@router.get("/ready")
+async def readiness(
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Readiness probe: MongoDB answers quickly and the connection pool is not saturated"""
+    checks = {}
+    ready = True
+    
+    # Mongo ping latency
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(db.command("ping"), HEALTH_PING_TIMEOUT_SECONDS)
+        ping_ms = (time.perf_counter() - start) * 1000
+        checks["mongo_ping_ms"] = round(ping_ms, 2)
+        if ping_ms > HEALTH_MAX_PING_MS:
+            ready = False
+    except Exception as e:
+        checks["mongo_error"] = type(e).__name__
+        ready = False
+    
+    # Pool saturation (worst server)
+    checked_out = max(mongo_pool_checked_out.snapshot().values(), default=0)
+    utilization = checked_out / MONGO_MAX_POOL_SIZE if MONGO_MAX_POOL_SIZE else 0
+    checks["pool_utilization"] = round(utilization, 3)
+    if utilization >= HEALTH_MAX_POOL_UTILIZATION:
+        ready = False
+    
+    return JSONResponse(
+        {"status": "ready" if ready else "unavailable", "checks": checks},
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
@@ -0,0 +1,63 @@
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from models import User, UserRole
+from auth import get_current_active_user
+from database import get_database
+from payments import FINAL_STATES, SIGNATURE_HEADER, finalise_payment, verify_signature
+
+router = APIRouter(prefix="/api/payments", tags=["payments"])
+
+PAYMENT_PROJECTION = {"_id": 0, "outbox": 0, "open": 0}
+
+@router.get("/{payment_id}")
+async def get_payment(
+    payment_id: str,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Get the state of a payment (payer or admin only)"""
+    payment = await db.payments.find_one({"id": payment_id}, PAYMENT_PROJECTION)
+    if not payment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Payment not found"
+        )
+
+    if current_user.id != payment["user_id"] and current_user.role != UserRole.admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only view your own payments"
+        )
+
+    return payment
+
+@router.post("/webhook")
+async def payment_webhook(
+    request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Gateway callback finalising a payment (HMAC-signed)"""
+    body = await request.body()
+    if not verify_signature(body, request.headers.get(SIGNATURE_HEADER)):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid webhook signature"
+        )
+
+    try:
+        event = json.loads(body)
+        payment_id, outcome = event["reference"], event["status"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Malformed webhook payload"
+        )
+    if outcome not in FINAL_STATES:
+        # Intermediate states carry nothing to record
+        return {"received": True}
+
+    updated = await finalise_payment(db, payment_id, outcome, event.get("id"), event.get("failure_reason"))
+    return {"received": True, "updated": updated}
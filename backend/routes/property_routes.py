@@ -1,14 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime, date
+import tempfile
+
+from pymongo.errors import DuplicateKeyError
 
 from models import (
     Property, PropertyCreate, PropertyUpdate, PropertyResponse,
     PropertySearchFilters, SearchResponse, User, UserRole
 )
 from auth import get_current_active_user
-from database import get_database
+from database import get_database, get_read_database
+from deadlines import read_deadline
+from counters import apply_property_count_changes
+from categories import categorize_property
+from http_cache import document_validators, conditional_response
+from serialization import validate_properties, property_list_adapter, json_response, model_response
+from coalescing import single_flight
+from home_bundle import home_bundle
+from booking_dates import overlap_filter
+from property_import import (
+    FORMATS as IMPORT_FORMATS, IMPORT_SPOOL_MAX_MEMORY_BYTES, import_properties, spool_request_body, text_stream
+)
 
 router = APIRouter(prefix="/api/properties", tags=["properties"])
 
@@ -20,7 +34,7 @@ async def list_properties(
     property_type: Optional[str] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    db: AsyncIOMotorDatabase = Depends(get_read_database)
 ):
     """List all active properties with optional filters"""
     filter_query = {"is_active": True}
@@ -42,7 +56,7 @@ async def list_properties(
     cursor = db.properties.find(filter_query).skip(skip).limit(limit)
     properties_data = await cursor.to_list(limit)
     
-    return [Property(**prop) for prop in properties_data]
+    return json_response(property_list_adapter, validate_properties(properties_data))
 
 @router.get("/search", response_model=SearchResponse)
 async def search_properties(
@@ -57,7 +71,7 @@ async def search_properties(
     amenities: Optional[str] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    db: AsyncIOMotorDatabase = Depends(get_read_database)
 ):
     """Advanced property search with availability checking"""
     filter_query = {"is_active": True}
@@ -89,10 +103,8 @@ async def search_properties(
         # Find properties that don't have conflicting bookings
         conflicting_bookings = await db.bookings.find({
             "status": {"$in": ["confirmed", "pending"]},
-            "$or": [
-                {"check_in": {"$lte": check_out}, "check_out": {"$gte": check_in}}
-            ]
-        }).to_list(None)
+            **overlap_filter(check_in, check_out)
+        }, {"_id": 0, "property_id": 1}).to_list(None)
         
         booked_property_ids = [booking["property_id"] for booking in conflicting_bookings]
         if booked_property_ids:
@@ -104,7 +116,7 @@ async def search_properties(
     # Fetch properties
     cursor = db.properties.find(filter_query).skip(skip).limit(limit)
     properties_data = await cursor.to_list(limit)
-    properties = [Property(**prop) for prop in properties_data]
+    properties = validate_properties(properties_data)
     
     # Create filters object
     filters = PropertySearchFilters(
@@ -119,29 +131,31 @@ async def search_properties(
         amenities=amenities.split(",") if amenities else None
     )
     
-    return SearchResponse(
+    return model_response(SearchResponse(
         properties=properties,
         total_count=total_count,
         filters_applied=filters
-    )
+    ))
 
 @router.get("/{property_id}", response_model=PropertyResponse)
 async def get_property(
     property_id: str,
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    request: Request,
+    response: Response,
+    db: AsyncIOMotorDatabase = Depends(get_read_database)
 ):
     """Get single property by ID"""
-    property_data = await db.properties.find_one({"id": property_id, "is_active": True})
-    if not property_data:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Property not found"
-        )
+    # Concurrent requests for the same page share one pair of lookups
+    property_data, owner_data = await single_flight.do(
+        ("property", property_id), lambda: _load_property(db, property_id)
+    )
     
-    property_obj = Property(**property_data)
+    # Answer revalidations before building the response models
+    not_modified = conditional_response(request, response, document_validators(property_data, owner_data))
+    if not_modified:
+        return not_modified
     
-    # Get owner info (optional)
-    owner_data = await db.users.find_one({"id": property_obj.owner_id})
+    property_obj = Property(**property_data)
     owner = None
     if owner_data:
         from models import UserResponse
@@ -154,7 +168,22 @@ async def get_property(
             created_at=owner_data["created_at"]
         )
     
-    return PropertyResponse(**property_obj.dict(), owner=owner)
+    return PropertyResponse(**property_obj.model_dump(), owner=owner)
+
+async def _load_property(db: AsyncIOMotorDatabase, property_id: str) -> Tuple[dict, Optional[dict]]:
+    property_data = await db.properties.find_one({"id": property_id, "is_active": True})
+    if not property_data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Property not found"
+        )
+    
+    # Get owner info (optional)
+    owner_data = await db.users.find_one(
+        {"id": property_data["owner_id"]},
+        {"_id": 0, "password_hash": 0}
+    )
+    return property_data, owner_data
 
 @router.post("", response_model=Property)
 async def create_property(
@@ -169,11 +198,57 @@ async def create_property(
             detail="Only property owners can create properties"
         )
     
-    property_obj = Property(**property_data.dict(), owner_id=current_user.id)
-    await db.properties.insert_one(property_obj.dict())
+    property_obj = Property(**property_data.model_dump(), owner_id=current_user.id)
+    property_obj.categories = categorize_property(property_obj.model_dump())
+    property_doc = property_obj.model_dump()
+    try:
+        await db.properties.insert_one(property_doc)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="You already have a property with this external_ref"
+        )
+    await apply_property_count_changes(db, None, property_doc)
+    home_bundle.invalidate()
     
     return property_obj
 
+@router.post("/import")
+async def import_properties_route(
+    request: Request,
+    format: Optional[str] = Query(None, description="ndjson or csv (default: from Content-Type)"),
+    owner_id: Optional[str] = Query(None, description="Import for another owner (admins only)"),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Bulk import properties from an NDJSON or CSV request body (owners and admins only)"""
+    if current_user.role not in [UserRole.owner, UserRole.admin]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only property owners can import properties"
+        )
+    if owner_id and owner_id != current_user.id and current_user.role != UserRole.admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only import your own properties"
+        )
+    
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    if fmt not in IMPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Format must be one of: {', '.join(IMPORT_FORMATS)}"
+        )
+    
+    # Spool the body (to disk past the threshold) and read it back batch by batch
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_MAX_MEMORY_BYTES) as spool:
+        await spool_request_body(request.stream(), spool)
+        report = await import_properties(db, owner_id or current_user.id, text_stream(spool), fmt)
+    
+    if report.inserted or report.updated:
+        home_bundle.invalidate()
+    return report.to_dict()
+
 @router.put("/{property_id}", response_model=Property)
 async def update_property(
     property_id: str,
@@ -183,7 +258,8 @@ async def update_property(
 ):
     """Update property (owner or admin only)"""
     # Get property
-    property_data = await db.properties.find_one({"id": property_id})
+    with read_deadline():
+        property_data = await db.properties.find_one({"id": property_id})
     if not property_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -199,11 +275,12 @@ async def update_property(
     
     # Prepare update data
     update_data = {}
-    for field, value in updates.dict(exclude_unset=True).items():
+    for field, value in updates.model_dump(exclude_unset=True).items():
         if value is not None:
             update_data[field] = value
     
     if update_data:
+        update_data["categories"] = categorize_property({**property_data, **update_data})
         update_data["updated_at"] = datetime.utcnow()
         await db.properties.update_one(
             {"id": property_id},
@@ -212,6 +289,8 @@ async def update_property(
     
     # Return updated property
     updated_data = await db.properties.find_one({"id": property_id})
+    await apply_property_count_changes(db, property_data, updated_data)
+    home_bundle.invalidate()
     return Property(**updated_data)
 
 @router.delete("/{property_id}")
@@ -222,7 +301,8 @@ async def delete_property(
 ):
     """Delete property (soft delete by setting inactive)"""
     # Get property
-    property_data = await db.properties.find_one({"id": property_id})
+    with read_deadline():
+        property_data = await db.properties.find_one({"id": property_id})
     if not property_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -241,5 +321,7 @@ async def delete_property(
         {"id": property_id},
         {"$set": {"is_active": False, "updated_at": datetime.utcnow()}}
     )
+    await apply_property_count_changes(db, property_data, {**property_data, "is_active": False})
+    home_bundle.invalidate()
     
     return {"message": "Property deleted successfully"}
\ No newline at end of file
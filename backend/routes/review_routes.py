@@ -1,46 +1,65 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from typing import List
 from datetime import datetime
+from functools import partial
 
 from models import Review, ReviewCreate, ReviewResponse, User, UserRole
 from auth import get_current_active_user
-from database import get_database
+from database import get_database, get_read_database
+from deadlines import read_deadline
+from streaming import wants_ndjson, ndjson_response
+from tracing import start_span
+from task_queue import task_queue, outbox_entry
+from tasks import RATING_DELETE_SAFETY_DELAY_SECONDS, UPDATE_PROPERTY_RATING, rating_task_key
+from archive import find_booking
 
 router = APIRouter(prefix="/api", tags=["reviews"])
 
+async def render_reviews(db: AsyncIOMotorDatabase, reviews_data: List[dict]) -> List[ReviewResponse]:
+    """Build review responses for a batch, enriched with one user lookup"""
+    from models import UserResponse
+    user_ids = list({review_data["user_id"] for review_data in reviews_data})
+    users_data = await db.users.find(
+        {"id": {"$in": user_ids}},
+        {"_id": 0, "id": 1, "first_name": 1, "last_name": 1, "role": 1, "created_at": 1}
+    ).to_list(None)
+    
+    # User info without sensitive data
+    users = {
+        user_data["id"]: UserResponse(
+            id=user_data["id"],
+            email="",  # Don't expose email
+            first_name=user_data["first_name"],
+            last_name=user_data["last_name"],
+            role=user_data["role"],
+            created_at=user_data["created_at"]
+        )
+        for user_data in users_data
+    }
+    
+    reviews = []
+    with start_span("pydantic.validate", model="ReviewResponse", count=len(reviews_data)):
+        for review_data in reviews_data:
+            review = Review(**review_data)
+            reviews.append(ReviewResponse(**review.model_dump(), user=users.get(review.user_id)))
+    return reviews
+
 @router.get("/properties/{property_id}/reviews", response_model=List[ReviewResponse])
 async def get_property_reviews(
     property_id: str,
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_read_database)
 ):
-    """Get all reviews for a property"""
-    reviews_data = await db.reviews.find({
+    """Get all reviews for a property (streamed with Accept: application/x-ndjson)"""
+    cursor = db.reviews.find({
         "property_id": property_id
-    }).sort("created_at", -1).to_list(None)
+    }).sort("created_at", -1)
     
-    # Enrich with user data
-    reviews = []
-    for review_data in reviews_data:
-        review = Review(**review_data)
-        
-        # Get user info (without sensitive data)
-        user = None
-        user_data = await db.users.find_one({"id": review.user_id})
-        if user_data:
-            from models import UserResponse
-            user = UserResponse(
-                id=user_data["id"],
-                email="",  # Don't expose email
-                first_name=user_data["first_name"],
-                last_name=user_data["last_name"],
-                role=user_data["role"],
-                created_at=user_data["created_at"]
-            )
-        
-        reviews.append(ReviewResponse(**review.dict(), user=user))
+    if wants_ndjson(request):
+        return ndjson_response(cursor, partial(render_reviews, db))
     
-    return reviews
+    return await render_reviews(db, await cursor.to_list(None))
 
 @router.post("/properties/{property_id}/reviews", response_model=ReviewResponse)
 async def create_review(
@@ -51,7 +70,8 @@ async def create_review(
 ):
     """Create a new review for a property"""
     # Verify property exists
-    property_data = await db.properties.find_one({"id": property_id, "is_active": True})
+    with read_deadline():
+        property_data = await db.properties.find_one({"id": property_id, "is_active": True})
     if not property_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -59,11 +79,12 @@ async def create_review(
         )
     
     # Check if user has a completed booking for this property
-    booking = await db.bookings.find_one({
-        "user_id": current_user.id,
-        "property_id": property_id,
-        "status": "completed"
-    })
+    with read_deadline():
+        booking = await find_booking(db, {
+            "user_id": current_user.id,
+            "property_id": property_id,
+            "status": "completed"
+        })
     if not booking:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -71,10 +92,11 @@ async def create_review(
         )
     
     # Check if user already reviewed this property
-    existing_review = await db.reviews.find_one({
-        "user_id": current_user.id,
-        "property_id": property_id
-    })
+    with read_deadline():
+        existing_review = await db.reviews.find_one({
+            "user_id": current_user.id,
+            "property_id": property_id
+        })
     if existing_review:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -83,15 +105,17 @@ async def create_review(
     
     # Create review
     review = Review(
-        **review_data.dict(),
+        **review_data.model_dump(),
         user_id=current_user.id,
         booking_id=booking["id"]
     )
     
-    await db.reviews.insert_one(review.dict())
-    
-    # Update property average rating
-    await update_property_rating(db, property_id)
+    # The rating recompute is queued in the same write as the review
+    await db.reviews.insert_one({
+        **review.model_dump(),
+        "outbox": [outbox_entry(UPDATE_PROPERTY_RATING, {"property_id": property_id}, rating_task_key(property_id))]
+    })
+    task_queue.notify()
     
     # Return review with user data
     from models import UserResponse
@@ -104,12 +128,12 @@ async def create_review(
         created_at=current_user.created_at
     )
     
-    return ReviewResponse(**review.dict(), user=user_response)
+    return ReviewResponse(**review.model_dump(), user=user_response)
 
 @router.get("/reviews/{review_id}", response_model=ReviewResponse)
 async def get_review(
     review_id: str,
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    db: AsyncIOMotorDatabase = Depends(get_read_database)
 ):
     """Get single review by ID"""
     review_data = await db.reviews.find_one({"id": review_id})
@@ -135,7 +159,7 @@ async def get_review(
             created_at=user_data["created_at"]
         )
     
-    return ReviewResponse(**review.dict(), user=user)
+    return ReviewResponse(**review.model_dump(), user=user)
 
 @router.put("/reviews/{review_id}", response_model=ReviewResponse)
 async def update_review(
@@ -145,7 +169,8 @@ async def update_review(
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Update review (author only)"""
-    review_data = await db.reviews.find_one({"id": review_id})
+    with read_deadline():
+        review_data = await db.reviews.find_one({"id": review_id})
     if not review_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -160,16 +185,20 @@ async def update_review(
         )
     
     # Update review
-    update_data = updates.dict()
+    update_data = updates.model_dump()
     update_data["updated_at"] = datetime.utcnow()
     
+    property_id = review_data["property_id"]
     await db.reviews.update_one(
         {"id": review_id},
-        {"$set": update_data}
+        {
+            "$set": update_data,
+            "$push": {"outbox": outbox_entry(
+                UPDATE_PROPERTY_RATING, {"property_id": property_id}, rating_task_key(property_id)
+            )}
+        }
     )
-    
-    # Update property rating
-    await update_property_rating(db, review_data["property_id"])
+    task_queue.notify()
     
     # Return updated review
     updated_data = await db.reviews.find_one({"id": review_id})
@@ -185,7 +214,7 @@ async def update_review(
         created_at=current_user.created_at
     )
     
-    return ReviewResponse(**review.dict(), user=user_response)
+    return ReviewResponse(**review.model_dump(), user=user_response)
 
 @router.delete("/reviews/{review_id}")
 async def delete_review(
@@ -194,7 +223,8 @@ async def delete_review(
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Delete review (author or admin only)"""
-    review_data = await db.reviews.find_one({"id": review_id})
+    with read_deadline():
+        review_data = await db.reviews.find_one({"id": review_id})
     if not review_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -211,41 +241,19 @@ async def delete_review(
     
     property_id = review_data["property_id"]
     
+    # No document is left to carry an outbox entry, so queue a delayed recompute
+    # first: it still runs if the process dies right after the delete
+    await task_queue.enqueue(
+        db, UPDATE_PROPERTY_RATING, {"property_id": property_id},
+        f"{rating_task_key(property_id)}:delete:{review_id}", delay_seconds=RATING_DELETE_SAFETY_DELAY_SECONDS
+    )
+    
     # Delete review
     await db.reviews.delete_one({"id": review_id})
     
-    # Update property rating
-    await update_property_rating(db, property_id)
+    # Recompute now (merged into any pending recompute of the property)
+    await task_queue.enqueue(
+        db, UPDATE_PROPERTY_RATING, {"property_id": property_id}, rating_task_key(property_id)
+    )
     
     return {"message": "Review deleted successfully"}
-
-async def update_property_rating(db: AsyncIOMotorDatabase, property_id: str):
-    """Update property's average rating and review count"""
-    # Calculate new average rating
-    pipeline = [
-        {"$match": {"property_id": property_id}},
-        {"$group": {
-            "_id": None,
-            "average_rating": {"$avg": "$rating"},
-            "review_count": {"$sum": 1}
-        }}
-    ]
-    
-    result = await db.reviews.aggregate(pipeline).to_list(1)
-    
-    if result:
-        avg_rating = round(result[0]["average_rating"], 1)
-        review_count = result[0]["review_count"]
-    else:
-        avg_rating = None
-        review_count = 0
-    
-    # Update property
-    await db.properties.update_one(
-        {"id": property_id},
-        {"$set": {
-            "average_rating": avg_rating,
-            "review_count": review_count,
-            "updated_at": datetime.utcnow()
-        }}
-    )
\ No newline at end of file
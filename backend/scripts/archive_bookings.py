@@ -0,0 +1,36 @@
+"""Move past bookings to the ``bookings_archive`` collection.
+
+Archives completed and cancelled bookings whose stay ended more than
+``--horizon-days`` ago, in batched copy-and-delete steps. The API processes
+also run this daily; an interrupted run is resumed by running it again.
+
+Run from the backend directory:
+    python scripts/archive_bookings.py --horizon-days 365
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from archive import ARCHIVE_BATCH_SIZE, ARCHIVE_HORIZON_DAYS, archive_bookings
+from database import connect_to_mongo, close_mongo_connection, db_instance
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--horizon-days", type=int, default=ARCHIVE_HORIZON_DAYS,
+                        help="archive bookings that ended more than this many days ago")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    await connect_to_mongo()
+    try:
+        archived = await archive_bookings(db_instance.database, args.horizon_days, args.batch_size)
+    finally:
+        await close_mongo_connection()
+
+    print(f"Archived {archived} bookings")
+
+if __name__ == "__main__":
+    asyncio.run(main())
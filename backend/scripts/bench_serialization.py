@@ -0,0 +1,79 @@
+"""Microbenchmark: per-item cost of rendering a 100-property listing.
+
+Compares the old path (``Property(**doc)`` per item, then FastAPI's
+``response_model`` validation and JSON encoding) with the fast path
+(bulk ``TypeAdapter`` validation and pydantic-core ``dump_json``).
+
+Run from the backend directory:  python scripts/bench_serialization.py
+"""
+import asyncio
+import sys
+import timeit
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from models import Property
+from serialization import property_list_adapter, validate_properties
+
+LISTING_SIZE = 100
+ROUNDS = 200
+
+def make_documents(count: int) -> List[dict]:
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "owner_id": "owner-1",
+            "name": f"Gîte {i}",
+            "description": "Stone cottage with a pool in the Vendée countryside. " * 4,
+            "bedrooms": 3,
+            "bathrooms": 2,
+            "max_guests": 6,
+            "property_type": "cottage",
+            "location": {
+                "address": f"{i} Rue de la Plage",
+                "city": "Pornic",
+                "region": "Loire, Vendée, Brittany and Burgundy",
+                "postal_code": "44210",
+                "latitude": 47.11,
+                "longitude": -2.1,
+            },
+            "price_per_night": 120.0 + i,
+            "images": [{"url": f"https://example.com/{i}/{n}.jpg", "is_primary": n == 0} for n in range(5)],
+            "amenities": ["wifi", "pool", "parking", "pets-allowed"],
+            "minimum_stay": 3,
+            "is_active": True,
+            "review_count": 4,
+            "average_rating": 4.5,
+            "categories": ["short-breaks", "pet-friendly"],
+            "created_at": datetime.utcnow(),
+        }
+        for i in range(count)
+    ]
+
+def main():
+    docs = make_documents(LISTING_SIZE)
+    field = create_response_field(name="Response", type_=List[Property])
+    loop = asyncio.new_event_loop()
+
+    def legacy():
+        models = [Property(**doc) for doc in docs]
+        content = loop.run_until_complete(serialize_response(field=field, response_content=models))
+        return JSONResponse(content).body
+
+    def fast():
+        return property_list_adapter.dump_json(validate_properties(docs))
+
+    for name, fn in (("response_model", legacy), ("TypeAdapter + dump_json", fast)):
+        seconds = min(timeit.repeat(fn, number=ROUNDS, repeat=3)) / ROUNDS
+        print(f"{name:>24}: {seconds * 1e3:7.3f} ms/listing  {seconds / LISTING_SIZE * 1e6:7.2f} µs/item")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Export bookings with property and guest details for accounting.
+
+Writes the bookings created in a month (or in ``[--start, --end)``) to a
+CSV or Parquet file, streaming them in bounded batches.
+
+Run from the backend directory:
+    python scripts/export_bookings.py --month 2025-06 --format parquet -o bookings-2025-06.parquet
+    python scripts/export_bookings.py --start 2025-06-01 --end 2025-06-16 --status confirmed --status completed
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from booking_export import FORMATS, export_bookings
+from database import connect_to_mongo, close_mongo_connection, db_instance
+from models import BookingStatus
+
+def parse_date(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m-%d")
+
+def month_range(value: str):
+    start = datetime.strptime(value, "%Y-%m")
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start, end
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--month", help="export bookings created in this month (YYYY-MM)")
+    parser.add_argument("--start", type=parse_date, help="first creation date included (YYYY-MM-DD)")
+    parser.add_argument("--end", type=parse_date, help="creation date to stop before (YYYY-MM-DD)")
+    parser.add_argument("--status", action="append", choices=[s.value for s in BookingStatus],
+                        help="only export bookings in this status (repeatable)")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("-o", "--output", help="output file (default: bookings-<start>-<end>.<format>)")
+    args = parser.parse_args()
+
+    if args.month:
+        start, end = month_range(args.month)
+    elif args.start and args.end:
+        start, end = args.start, args.end
+    else:
+        parser.error("give --month or both --start and --end")
+    if end <= start:
+        parser.error("--end must be after --start")
+    output = args.output or f"bookings-{start:%Y-%m-%d}-{end:%Y-%m-%d}.{args.format}"
+
+    await connect_to_mongo()
+    try:
+        with open(output, "wb") as sink:
+            rows = await export_bookings(db_instance.database, sink, args.format, start, end, args.status)
+    finally:
+        await close_mongo_connection()
+
+    print(f"Exported {rows} bookings to {output}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+"""Fake payment gateway for local runs, tests and load tests.
+
+Implements the ``POST /charges`` call made by ``payments.HttpPaymentGateway``
+with configurable latency and failure rates, then calls the webhook back
+with the final status, signed with ``PAYMENT_WEBHOOK_SECRET`` from the
+environment or ``backend/.env`` (as the server reads it). Charges are
+idempotent on the ``Idempotency-Key`` header, like a real provider.
+
+Run from the backend directory:
+    python scripts/fake_gateway.py --port 8099 --latency-ms 300 --failure-rate 0.05 --decline-rate 0.1
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import uuid
+from pathlib import Path
+from typing import Dict
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import httpx
+import uvicorn
+from dotenv import load_dotenv
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import JSONResponse
+
+# Sign with the server's secret: load its .env before payments reads it
+load_dotenv(BACKEND_DIR / ".env")
+
+from payments import PAYMENT_WEBHOOK_SECRET, SIGNATURE_HEADER, sign_payload
+
+def create_app(latency_ms: float, jitter_ms: float, failure_rate: float, decline_rate: float,
+               callback_delay_ms: float, secret: str) -> FastAPI:
+    app = FastAPI(title="Fake payment gateway")
+    charges: Dict[str, Dict] = {}
+    callbacks: set = set()
+    client = httpx.AsyncClient(timeout=10)
+
+    async def simulate_latency(mean_ms: float):
+        await asyncio.sleep(max(0.0, random.gauss(mean_ms, jitter_ms)) / 1000)
+
+    async def send_callback(idempotency_key: str, charge: Dict, callback_url: str):
+        await simulate_latency(callback_delay_ms)
+        # Settled: a re-sent charge now answers with the final status
+        charges[idempotency_key] = charge
+        body = json.dumps(charge).encode()
+        for attempt in range(5):
+            try:
+                response = await client.post(
+                    callback_url, content=body,
+                    headers={"Content-Type": "application/json", SIGNATURE_HEADER: sign_payload(body, secret)}
+                )
+                if response.status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(2 ** attempt)
+
+    @app.post("/charges")
+    async def create_charge(request: Request, idempotency_key: str = Header(...)):
+        await simulate_latency(latency_ms)
+        if idempotency_key in charges:
+            return charges[idempotency_key]
+        if random.random() < failure_rate:
+            return JSONResponse({"error": "gateway unavailable"}, status_code=503)
+
+        data = await request.json()
+        declined = random.random() < decline_rate
+        charge = {
+            "id": f"ch_{uuid.uuid4().hex[:16]}",
+            "reference": data["reference"],
+            "amount": data["amount"],
+            "currency": data["currency"],
+            "status": "failed" if declined else "succeeded",
+            "failure_reason": "card_declined" if declined else None,
+        }
+        charges[idempotency_key] = {**charge, "status": "submitted", "failure_reason": None}
+        task = asyncio.create_task(send_callback(idempotency_key, charge, data["callback_url"]))
+        callbacks.add(task)
+        task.add_done_callback(callbacks.discard)
+        return charges[idempotency_key]
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=300, help="mean charge latency")
+    parser.add_argument("--jitter-ms", type=float, default=100, help="latency standard deviation")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of charges answered with 503")
+    parser.add_argument("--decline-rate", type=float, default=0.0, help="share of charges declined")
+    parser.add_argument("--callback-delay-ms", type=float, default=500, help="mean delay before the webhook")
+    parser.add_argument("--secret", default=None, help="webhook signing secret (default: PAYMENT_WEBHOOK_SECRET)")
+    args = parser.parse_args()
+    secret = args.secret or PAYMENT_WEBHOOK_SECRET
+    if not secret:
+        parser.error("--secret or PAYMENT_WEBHOOK_SECRET is required to sign webhooks")
+
+    app = create_app(args.latency_ms, args.jitter_ms, args.failure_rate, args.decline_rate,
+                     args.callback_delay_ms, secret)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""Index audit: explain every route query shape and flag bad plans.
+
+Runs ``explain`` (executionStats) for each query shape the route handlers
+issue and reports collection scans, blocking in-memory sorts and poor index
+selectivity. Exits with status 1 when any shape is flagged, so it can gate CI
+against a seeded local mongod.
+
+Run from the backend directory:
+    MONGO_URL=mongodb://localhost:27017 python scripts/index_audit.py --seed
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from booking_dates import overlap_filter
+from database import connect_to_mongo, close_mongo_connection, db_instance
+
+# A shape is flagged when it examines more than this many documents per result
+MAX_DOCS_EXAMINED_RATIO = 10
+# ...and examines at least this many documents in total (tiny scans are fine)
+MIN_DOCS_EXAMINED = 100
+
+NOW = datetime(2025, 7, 1)
+
+class QueryShape(NamedTuple):
+    route: str
+    collection: str
+    filter: Dict
+    sort: Optional[Dict] = None
+    limit: Optional[int] = None
+    # Unanchored case-insensitive regexes cannot use index bounds
+    allow_poor_selectivity: bool = False
+
+QUERY_SHAPES: List[QueryShape] = [
+    # properties
+    QueryShape("list_properties", "properties", {"is_active": True}, limit=20),
+    QueryShape("search_properties", "properties",
+               {"is_active": True, "max_guests": {"$gte": 4}, "price_per_night": {"$lte": 200}}, limit=20),
+    QueryShape("get_property", "properties", {"id": "prop-42", "is_active": True}),
+    QueryShape("home bundle (latest properties)", "properties", {"is_active": True}, sort={"created_at": -1}, limit=12),
+    QueryShape("get_inspiration_properties", "properties", {"categories": "large-groups", "is_active": True}, limit=20),
+    QueryShape("get_destination_properties", "properties",
+               {"location.region": {"$regex": "Dordogne", "$options": "i"}, "is_active": True},
+               allow_poor_selectivity=True),
+    # bookings
+    QueryShape("check_property_availability", "bookings", {
+        "property_id": "prop-42",
+        "status": {"$in": ["confirmed", "pending"]},
+        **overlap_filter(NOW.date(), NOW.date() + timedelta(days=7)),
+    }, limit=1),
+    QueryShape("search_properties (conflicting bookings)", "bookings", {
+        "status": {"$in": ["confirmed", "pending"]},
+        **overlap_filter(NOW.date(), NOW.date() + timedelta(days=7)),
+    }),
+    QueryShape("list_user_bookings", "bookings", {"user_id": "user-7"}, sort={"created_at": -1}),
+    QueryShape("get_booking", "bookings", {"id": "booking-42"}),
+    QueryShape("get_booking (archive)", "bookings_archive", {"id": "booking-42"}),
+    QueryShape("list_user_bookings (archive)", "bookings_archive", {"user_id": "user-7"}, sort={"created_at": -1}),
+    QueryShape("archive_bookings", "bookings", {
+        "status": {"$in": ["completed", "cancelled"]},
+        "check_out": {"$lt": NOW - timedelta(days=365)},
+        "outbox.0": {"$exists": False},
+    }, limit=500),
+    QueryShape("refresh_daily_stats", "bookings", {
+        "property_id": "prop-42",
+        "status": {"$in": ["confirmed", "completed"]},
+        **overlap_filter(NOW.date(), NOW.date() + timedelta(days=7)),
+    }),
+    QueryShape("export_bookings", "bookings",
+               {"created_at": {"$gte": NOW - timedelta(days=30), "$lt": NOW}}, sort={"created_at": 1}),
+    QueryShape("create_review (completed booking)", "bookings",
+               {"user_id": "user-7", "property_id": "prop-42", "status": "completed"}, limit=1),
+    # payments
+    QueryShape("reconcile_stale_payments", "payments",
+               {"open": True, "status": "submitted", "updated_at": {"$lt": NOW - timedelta(minutes=15)}},
+               sort={"updated_at": 1}, limit=100),
+    # reviews
+    QueryShape("get_property_reviews", "reviews", {"property_id": "prop-42"}, sort={"created_at": -1}),
+    QueryShape("create_review (existing review)", "reviews", {"user_id": "user-7", "property_id": "prop-42"}, limit=1),
+    QueryShape("get_review", "reviews", {"id": "review-42"}),
+    # users and sessions
+    QueryShape("get_user_by_email", "users", {"email": "user7@example.com"}),
+    QueryShape("get_user_by_id", "users", {"id": "user-7"}),
+    QueryShape("get_current_user (session)", "sessions", {"token": "token-7", "expires_at": {"$gt": NOW}}),
+    # content
+    QueryShape("list_blog_posts", "blog_posts", {"published": True}, sort={"published_at": -1}, limit=10),
+    QueryShape("get_blog_post", "blog_posts", {"slug": "post-7", "published": True}),
+    QueryShape("get_destination", "destinations", {"slug": "dordogne-south-west"}),
+    QueryShape("get_inspiration_properties (category)", "inspiration_categories", {"slug": "large-groups"}),
+    QueryShape("special offers cache refresh", "special_offers", {"active": True, "valid_until": {"$gte": NOW}}),
+    # cache invalidation (polling fallback)
+    QueryShape("invalidation poll", "properties", {}, sort={"updated_at": -1}, limit=1),
+    QueryShape("invalidation poll (users)", "users", {}, sort={"updated_at": -1}, limit=1),
+    # analytics
+    QueryShape("owner analytics", "property_daily_stats", {
+        "property_id": {"$in": ["prop-42", "prop-43"]},
+        "date": {"$gte": NOW - timedelta(days=365), "$lt": NOW},
+    }),
+]
+
+def _plan_stages(node) -> List[str]:
+    stages = []
+    if isinstance(node, dict):
+        if "stage" in node:
+            stages.append(node["stage"])
+        for value in node.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(node, list):
+        for value in node:
+            stages.extend(_plan_stages(value))
+    return stages
+
+async def explain_shape(db: AsyncIOMotorDatabase, shape: QueryShape) -> Dict:
+    find = {"find": shape.collection, "filter": shape.filter}
+    if shape.sort:
+        find["sort"] = shape.sort
+    if shape.limit:
+        find["limit"] = shape.limit
+    return await db.command({"explain": find, "verbosity": "executionStats"})
+
+def audit_plan(shape: QueryShape, explain: Dict) -> List[str]:
+    """Return problems found in an explain result."""
+    stages = _plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+    execution = explain.get("executionStats", {})
+
+    problems = []
+    if "COLLSCAN" in stages:
+        problems.append("collection scan")
+    if "SORT" in stages:
+        problems.append("blocking in-memory sort")
+    examined = execution.get("totalDocsExamined", 0)
+    returned = max(execution.get("nReturned", 0), 1)
+    if (not shape.allow_poor_selectivity and examined >= MIN_DOCS_EXAMINED
+            and examined / returned > MAX_DOCS_EXAMINED_RATIO):
+        problems.append(f"poor selectivity ({examined} docs examined for {returned} returned)")
+    return problems
+
+async def run_audit(db: AsyncIOMotorDatabase) -> int:
+    """Explain every query shape, print a report and return the number of flagged shapes."""
+    flagged = 0
+    for shape in QUERY_SHAPES:
+        problems = audit_plan(shape, await explain_shape(db, shape))
+        status = "FAIL" if problems else "ok"
+        print(f"[{status:>4}] {shape.route:<45} {shape.collection:<22} {'; '.join(problems)}")
+        flagged += bool(problems)
+    return flagged
+
+async def seed_audit_data(db: AsyncIOMotorDatabase, properties: int = 2000, users: int = 500, bookings: int = 10000):
+    """Fill an empty database with synthetic data sized so that bad plans are visible."""
+    rng = random.Random(7)
+    regions = ["Loire, Vendée, Brittany and Burgundy", "Dordogne and South-West",
+               "Occitanie (inc. Languedoc)", "Provence, Côte d'Azur and Corsica"]
+    categories = ["couples", "large-groups", "short-breaks", "pet-friendly"]
+
+    await db.users.insert_many([{
+        "id": f"user-{i}", "email": f"user{i}@example.com", "first_name": "Test", "last_name": f"User {i}",
+        "password_hash": "x", "role": "owner" if i < 50 else "guest", "is_active": True,
+        "created_at": NOW - timedelta(days=i),
+    } for i in range(users)])
+    await db.sessions.insert_many([{
+        "id": str(uuid.uuid4()), "user_id": f"user-{i}", "token": f"token-{i}",
+        "expires_at": NOW + timedelta(days=1), "created_at": NOW,
+    } for i in range(users)])
+    await db.properties.insert_many([{
+        "id": f"prop-{i}", "owner_id": f"user-{i % 50}", "name": f"Property {i}", "description": "Seeded",
+        "bedrooms": rng.randint(1, 8), "bathrooms": rng.randint(1, 4), "max_guests": rng.randint(2, 16),
+        "property_type": rng.choice(["villa", "chateau", "cottage", "apartment", "farmhouse"]),
+        "location": {"address": "", "city": "", "region": rng.choice(regions), "postal_code": "", "country": "France"},
+        "price_per_night": rng.uniform(60, 900), "images": [], "amenities": [], "minimum_stay": rng.randint(1, 7),
+        "is_active": rng.random() > 0.1, "review_count": 0,
+        "categories": rng.sample(categories, rng.randint(0, 2)), "created_at": NOW - timedelta(days=i),
+    } for i in range(properties)])
+    booking_docs = []
+    for i in range(bookings):
+        check_in = NOW + timedelta(days=rng.randint(-700, 300))
+        booking_docs.append({
+            "id": f"booking-{i}", "user_id": f"user-{rng.randrange(users)}", "property_id": f"prop-{rng.randrange(properties)}",
+            "check_in": check_in, "check_out": check_in + timedelta(days=rng.randint(2, 14)), "guests": 2,
+            "total_price": 1000.0, "status": rng.choice(["pending", "confirmed", "cancelled", "completed"]),
+            "payment_status": "pending", "created_at": check_in - timedelta(days=rng.randint(1, 200)),
+        })
+    await db.bookings.insert_many(booking_docs)
+    payment_docs = []
+    for booking in booking_docs:
+        created_at = booking["created_at"] + timedelta(minutes=5)
+        payment = {
+            "id": f"payment-{booking['id']}", "booking_id": booking["id"], "user_id": booking["user_id"],
+            "amount": booking["total_price"], "currency": "EUR", "status": rng.choice(["succeeded", "failed"]),
+            "created_at": created_at, "updated_at": created_at,
+        }
+        if rng.random() < 0.02:
+            payment.update(status=rng.choice(["pending", "submitted"]), open=True)
+        payment_docs.append(payment)
+    await db.payments.insert_many(payment_docs)
+    archived_docs = []
+    for i in range(bookings // 2):
+        check_in = NOW - timedelta(days=rng.randint(400, 1500))
+        archived_docs.append({
+            "id": f"archived-{i}", "user_id": f"user-{rng.randrange(users)}", "property_id": f"prop-{rng.randrange(properties)}",
+            "check_in": check_in, "check_out": check_in + timedelta(days=rng.randint(2, 14)), "guests": 2,
+            "total_price": 1000.0, "status": rng.choice(["cancelled", "completed"]), "payment_status": "completed",
+            "created_at": check_in - timedelta(days=rng.randint(1, 200)), "archived_at": NOW,
+        })
+    await db.bookings_archive.insert_many(archived_docs)
+    await db.property_daily_stats.insert_many([{
+        "property_id": f"prop-{i}", "owner_id": f"user-{i % 50}", "date": NOW - timedelta(days=night),
+        "nights_booked": 1, "revenue": 150.0, "arrivals": 0, "lead_time_days": 0,
+    } for i in range(min(properties, 100)) for night in range(1, 366) if rng.random() < 0.5])
+    await db.reviews.insert_many([{
+        "id": f"review-{i}", "user_id": f"user-{rng.randrange(users)}", "property_id": f"prop-{rng.randrange(properties)}",
+        "rating": rng.randint(1, 5), "title": "Seeded", "content": "Seeded", "created_at": NOW - timedelta(days=i),
+    } for i in range(bookings // 4)])
+    await db.blog_posts.insert_many([{
+        "id": f"blog-seed-{i}", "title": f"Post {i}", "slug": f"post-{i}", "content": "Seeded", "author_id": "user-0",
+        "published": i % 3 != 0, "published_at": NOW - timedelta(days=i), "created_at": NOW - timedelta(days=i),
+    } for i in range(300)])
+    await db.special_offers.insert_many([{
+        "id": f"offer-{i}", "title": f"Offer {i}", "description": "Seeded", "discount_percentage": 10,
+        "valid_from": NOW + timedelta(days=30 * (i - 100)), "valid_until": NOW + timedelta(days=30 * (i - 99)),
+        "property_ids": [], "active": True, "created_at": NOW,
+    } for i in range(200)])
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", action="store_true", help="seed synthetic data if the database is empty")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DB_NAME", "purefrance_index_audit")
+    await connect_to_mongo()
+    db = db_instance.database
+    try:
+        if args.seed and await db.properties.estimated_document_count() == 0:
+            await seed_audit_data(db)
+        flagged = await run_audit(db)
+    finally:
+        await close_mongo_connection()
+
+    print(f"\n{flagged} of {len(QUERY_SHAPES)} query shapes flagged")
+    sys.exit(1 if flagged else 0)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+"""Invalidation check: verify that writes reach subscribed caches as events.
+
+Starts an invalidation watcher with its own bus, subscribed like the app's
+caches, then inserts, updates and deletes a document in each watched
+collection and waits for the matching events. Run it against a single-node replica set for change streams, or
+with ``--mode poll`` (also works against a standalone mongod). Exits with
+status 1 when an expected event does not arrive.
+
+Run from the backend directory:
+    MONGO_URL=mongodb://localhost:27017/?replicaSet=rs0 python scripts/invalidation_check.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from invalidation import FLUSH, InvalidationBus, InvalidationEvent, InvalidationWatcher, register_caches
+
+EVENT_TIMEOUT_SECONDS = 15
+
+async def expect(events: asyncio.Queue, collection: str, operations: List[str]) -> bool:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + EVENT_TIMEOUT_SECONDS
+    while loop.time() < deadline:
+        try:
+            event: InvalidationEvent = await asyncio.wait_for(events.get(), deadline - loop.time())
+        except asyncio.TimeoutError:
+            break
+        if event.collection == collection and event.operation in operations:
+            return True
+    return False
+
+async def run_check(mode: str) -> int:
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.environ.get("DB_NAME", "purefrance_invalidation_check")]
+
+    bus = InvalidationBus()
+    events: asyncio.Queue = asyncio.Queue()
+    register_caches(bus)
+    collections = bus.collections()
+    bus.subscribe(collections, events.put_nowait)
+    watcher = InvalidationWatcher(db, bus)
+    task = asyncio.create_task(watcher.run(mode))
+    # Let the stream open (or the poller take its first fingerprints)
+    await asyncio.sleep(2)
+    # Drop the flushes published when the stream opens
+    while not events.empty():
+        events.get_nowait()
+
+    failures = 0
+    try:
+        for collection in collections:
+            doc_id = f"check-{uuid.uuid4().hex[:8]}"
+            steps = [
+                ("insert", lambda: db[collection].insert_one({"id": doc_id, "created_at": datetime.utcnow()})),
+                ("update", lambda: db[collection].update_one({"id": doc_id}, {"$set": {"updated_at": datetime.utcnow()}})),
+                ("delete", lambda: db[collection].delete_one({"id": doc_id})),
+            ]
+            for operation, write in steps:
+                await write()
+                ok = await expect(events, collection, [operation, FLUSH])
+                print(f"[{'ok' if ok else 'FAIL':>4}] {collection:<24} {operation}")
+                failures += not ok
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        client.close()
+    return failures
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["auto", "poll"], default="auto",
+                        help="tail the change stream (falling back to polling) or force polling")
+    args = parser.parse_args()
+
+    failures = await run_check(args.mode)
+    print(f"\n{failures} expected events missing")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    asyncio.run(main())
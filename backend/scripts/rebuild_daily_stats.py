@@ -0,0 +1,34 @@
+"""Rebuild the owner analytics rollups (``property_daily_stats``) from bookings.
+
+Use it to backfill after deploying the rollups, or to repair them. Booking
+changes made while it runs are applied by their own refresh tasks.
+
+Run from the backend directory:
+    python scripts/rebuild_daily_stats.py
+    python scripts/rebuild_daily_stats.py --property-id prop-42 --property-id prop-43
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from analytics import rebuild_daily_stats
+from database import connect_to_mongo, close_mongo_connection, db_instance
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--property-id", action="append", help="only rebuild this property (repeatable)")
+    args = parser.parse_args()
+
+    await connect_to_mongo()
+    try:
+        rebuilt = await rebuild_daily_stats(db_instance.database, args.property_id)
+    finally:
+        await close_mongo_connection()
+
+    print(f"Rebuilt daily stats for {rebuilt} properties")
+
+if __name__ == "__main__":
+    asyncio.run(main())
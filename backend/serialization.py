@@ -0,0 +1,28 @@
+from typing import Any, List
+
+from fastapi import Response, status
+from pydantic import BaseModel, TypeAdapter
+
+from models import Property
+from tracing import start_span
+
+# Bulk validators for trusted database documents
+property_list_adapter = TypeAdapter(List[Property])
+
+def validate_properties(properties_data: List[dict]) -> List[Property]:
+    """Validate a batch of property documents in a single pydantic-core call."""
+    with start_span("pydantic.validate", model="Property", count=len(properties_data)):
+        return property_list_adapter.validate_python(properties_data)
+
+def json_response(adapter: TypeAdapter, value: Any, status_code: int = status.HTTP_200_OK) -> Response:
+    """Render already-validated data directly to JSON.
+
+    Returning a ``Response`` bypasses FastAPI's second ``response_model``
+    validation and ``jsonable_encoder`` pass; the route's ``response_model``
+    is still used for the OpenAPI schema.
+    """
+    return Response(content=adapter.dump_json(value), media_type="application/json", status_code=status_code)
+
+def model_response(model: BaseModel, status_code: int = status.HTTP_200_OK) -> Response:
+    """Render a single validated model directly to JSON."""
+    return Response(content=model.model_dump_json(), media_type="application/json", status_code=status_code)
@@ -1,12 +1,33 @@
 from fastapi import FastAPI, APIRouter
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
+from pymongo.errors import PyMongoError
 from starlette.middleware.cors import CORSMiddleware
 import os
+import asyncio
 import logging
 from pathlib import Path
+from typing import List
+
+# Load .env before the local imports: modules read their configuration at import time
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
 
 # Import database and route modules
-from database import connect_to_mongo, close_mongo_connection, init_sample_data, get_database
+from database import connect_to_mongo, close_mongo_connection, get_database
+from counters import run_count_reconciliation
+from archive import run_booking_archival
+from home_bundle import run_home_bundle_refresh
+from invalidation import register_caches, run_invalidation_watcher
+from task_queue import task_queue
+from payments import get_gateway, run_payment_reconciliation
+import tasks  # Registers the task handlers
+from metrics import MetricsMiddleware, render_metrics
+from query_audit import QueryAuditMiddleware, query_audit_enabled
+from tracing import TracingMiddleware
+from profiling import ProfilingMiddleware
+from deadlines import DeadlineMiddleware, database_error_handler
+from admission import ADMISSION_ENABLED, AdmissionMiddleware
 from routes.auth_routes import router as auth_router
 from routes.property_routes import router as property_router
 from routes.destination_routes import router as destination_router
@@ -14,9 +35,9 @@ from routes.booking_routes import router as booking_router
 from routes.blog_routes import router as blog_router
 from routes.content_routes import router as content_router
 from routes.review_routes import router as review_router
-
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
+from routes.health_routes import router as health_router
+from routes.payment_routes import router as payment_router
+from routes.analytics_routes import router as analytics_router
 
 # Create the main app
 app = FastAPI(
@@ -28,19 +49,33 @@ app = FastAPI(
 # Global database reference for auth module
 db = None
 
+# Long-running background jobs started with the app
+background_tasks: List[asyncio.Task] = []
+
 @app.on_event("startup")
 async def startup_db_client():
-    """Initialize database connection and sample data"""
+    """Initialize database connection (migrations also seed sample data)"""
     global db
     await connect_to_mongo()
     from database import db_instance
     db = db_instance.database
-    await init_sample_data()
+    background_tasks.append(asyncio.create_task(run_count_reconciliation(db)))
+    background_tasks.append(asyncio.create_task(run_home_bundle_refresh(db)))
+    register_caches()
+    background_tasks.append(asyncio.create_task(run_invalidation_watcher(db)))
+    background_tasks.append(asyncio.create_task(task_queue.run(db)))
+    background_tasks.append(asyncio.create_task(run_booking_archival(db)))
+    background_tasks.append(asyncio.create_task(run_payment_reconciliation(db)))
     print("Pure France API started successfully")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     """Close database connection"""
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    await get_gateway().close()
     await close_mongo_connection()
     print("Database connection closed")
 
@@ -49,6 +84,11 @@ async def shutdown_db_client():
 async def root():
     return {"message": "Pure France API is running", "status": "healthy"}
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # Include all routers
 app.include_router(auth_router)
 app.include_router(property_router)
@@ -57,6 +97,30 @@ app.include_router(booking_router)
 app.include_router(blog_router)
 app.include_router(content_router)
 app.include_router(review_router)
+app.include_router(payment_router)
+app.include_router(analytics_router)
+app.include_router(health_router)
+
+# Per-route database budgets (maxTimeMS) and cancellation on client disconnect
+app.add_middleware(DeadlineMiddleware, routes=app.routes)
+app.add_exception_handler(PyMongoError, database_error_handler)
+
+# Load shedding: per-class concurrency limits with bounded, prioritised wait
+# queues. Outside the deadline so queueing does not eat the database budget.
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware)
+
+app.add_middleware(MetricsMiddleware, routes=app.routes)
+
+# Request tracing (TRACING_EXPORTER=jsonl, head-sampled at TRACE_SAMPLE_RATE)
+app.add_middleware(TracingMiddleware)
+
+# Admin-only on-demand profiling (X-Profile: store|text)
+app.add_middleware(ProfilingMiddleware)
+
+# N+1 / slow-query detection (QUERY_AUDIT_MODE=log or strict; off in production)
+if query_audit_enabled():
+    app.add_middleware(QueryAuditMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
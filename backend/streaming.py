@@ -0,0 +1,59 @@
+import os
+from typing import AsyncIterator, Awaitable, Callable, Dict, List
+
+import pymongo
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorCursor
+from pydantic import BaseModel
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_BATCH_SIZE = int(os.environ.get("STREAM_BATCH_SIZE", "100"))
+# Database time budget for fetching one batch of a streamed response
+STREAM_BATCH_BUDGET_MS = int(os.environ.get("STREAM_BATCH_BUDGET_MS", "5000"))
+
+# Turns a batch of raw documents into response models (may enrich them with lookups)
+BatchRenderer = Callable[[List[Dict]], Awaitable[List[BaseModel]]]
+
+def wants_ndjson(request: Request) -> bool:
+    """Check whether the client asked for a streamed NDJSON response."""
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+async def iter_batches(
+    cursor: AsyncIOMotorCursor,
+    batch_size: int = STREAM_BATCH_SIZE,
+    budget_ms: int = STREAM_BATCH_BUDGET_MS
+) -> AsyncIterator[List[Dict]]:
+    """Yield documents from a cursor in bounded batches, closing it when done or abandoned.
+
+    Fetching each batch has its own database budget, so a long stream is not
+    cut off by a total deadline.
+    """
+    cursor.batch_size(batch_size)
+    try:
+        while True:
+            # Not held across the yield, so the budget does not leak to the consumer
+            with pymongo.timeout(budget_ms / 1000):
+                batch = await cursor.to_list(batch_size)
+            if not batch:
+                break
+            yield batch
+    finally:
+        await cursor.close()
+
+async def _iter_ndjson(cursor: AsyncIOMotorCursor, render_batch: BatchRenderer, batch_size: int) -> AsyncIterator[bytes]:
+    async for batch in iter_batches(cursor, batch_size):
+        with pymongo.timeout(STREAM_BATCH_BUDGET_MS / 1000):
+            items = await render_batch(batch)
+        yield "".join(item.model_dump_json() + "\n" for item in items).encode()
+
+def ndjson_response(
+    cursor: AsyncIOMotorCursor,
+    render_batch: BatchRenderer,
+    batch_size: int = STREAM_BATCH_SIZE
+) -> StreamingResponse:
+    """Stream a cursor as NDJSON with memory bounded by ``batch_size``."""
+    return StreamingResponse(
+        _iter_ndjson(cursor, render_batch, batch_size),
+        media_type=NDJSON_MEDIA_TYPE
+    )
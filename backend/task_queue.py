@@ -0,0 +1,233 @@
+"""Durable background tasks for post-write side effects.
+
+Tasks live in the ``tasks`` collection and are run by a pool of worker
+coroutines in every API process. A worker claims a task with a lease, so a
+task held by a crashed process is picked up again once its lease expires.
+Failed tasks are retried with exponential backoff until ``TASK_MAX_ATTEMPTS``.
+Tasks given a ``dedup_key`` are merged while pending: enqueuing a second
+"recompute rating of property X" before the first one has started is a no-op.
+
+Routes that must not lose a side effect use the outbox: ``outbox_entry``
+values are embedded in the primary document in the same write (a single
+document write is atomic), and the relay moves them into ``tasks``
+afterwards. The relay is idempotent: a task's ``id`` is its outbox entry id.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+TASK_WORKERS = int(os.environ.get("TASK_WORKERS", "4"))
+TASK_POLL_SECONDS = float(os.environ.get("TASK_POLL_SECONDS", "1"))
+TASK_LEASE_SECONDS = int(os.environ.get("TASK_LEASE_SECONDS", "60"))
+TASK_MAX_ATTEMPTS = int(os.environ.get("TASK_MAX_ATTEMPTS", "5"))
+TASK_BACKOFF_BASE_SECONDS = float(os.environ.get("TASK_BACKOFF_BASE_SECONDS", "2"))
+TASK_BACKOFF_MAX_SECONDS = float(os.environ.get("TASK_BACKOFF_MAX_SECONDS", "300"))
+TASK_RETENTION_DAYS = int(os.environ.get("TASK_RETENTION_DAYS", "7"))
+OUTBOX_POLL_SECONDS = float(os.environ.get("OUTBOX_POLL_SECONDS", "2"))
+OUTBOX_BATCH_SIZE = 100
+
+# Collections whose documents may carry an ``outbox`` array
+OUTBOX_COLLECTIONS = ["reviews", "payments", "bookings"]
+
+TaskHandler = Callable[[AsyncIOMotorDatabase, Dict[str, Any]], Awaitable[None]]
+TASK_HANDLERS: Dict[str, TaskHandler] = {}
+
+tasks_enqueued = Counter("tasks_enqueued_total", "Tasks enqueued", ("task",))
+tasks_deduplicated = Counter("tasks_deduplicated_total", "Enqueues merged into a pending task", ("task",))
+tasks_finished = Counter("tasks_finished_total", "Task attempts by outcome", ("task", "outcome"))
+tasks_running = Gauge("tasks_running", "Tasks being run by this process", ("task",))
+task_duration = Histogram("task_duration_seconds", "Task run time", ("task",))
+task_queue_delay = Histogram("task_queue_delay_seconds", "Time from enqueue to first run", ("task",))
+
+def task_handler(name: str):
+    """Register a coroutine ``handler(db, payload)`` for a task name."""
+    def decorator(handler: TaskHandler) -> TaskHandler:
+        TASK_HANDLERS[name] = handler
+        return handler
+    return decorator
+
+def outbox_entry(name: str, payload: Dict[str, Any], dedup_key: Optional[str] = None) -> Dict[str, Any]:
+    """A task to embed in the ``outbox`` array of the document being written."""
+    return {
+        "id": str(uuid.uuid4()),
+        "name": name,
+        "payload": payload,
+        "dedup_key": dedup_key,
+        "created_at": datetime.utcnow(),
+    }
+
+def backoff_seconds(attempts: int) -> float:
+    delay = min(TASK_BACKOFF_MAX_SECONDS, TASK_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+class TaskQueue:
+    """Enqueue tasks and run them with an in-process worker pool."""
+
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+        self._outbox_wakeup = asyncio.Event()
+
+    def notify(self):
+        """Wake idle workers and the outbox relay (call after a write)."""
+        self._wakeup.set()
+        self._outbox_wakeup.set()
+
+    async def enqueue(
+        self,
+        db: AsyncIOMotorDatabase,
+        name: str,
+        payload: Dict[str, Any],
+        dedup_key: Optional[str] = None,
+        task_id: Optional[str] = None,
+        delay_seconds: float = 0,
+    ) -> bool:
+        """Insert a pending task; returns False when it was deduplicated."""
+        now = datetime.utcnow()
+        task = {
+            "id": task_id or str(uuid.uuid4()),
+            "name": name,
+            "payload": payload,
+            "dedup_key": dedup_key,
+            "status": "pending",
+            "attempts": 0,
+            "run_at": now + timedelta(seconds=delay_seconds),
+            "created_at": now,
+        }
+        try:
+            await db.tasks.insert_one(task)
+        except DuplicateKeyError:
+            # Same outbox entry relayed twice, or a pending task with this dedup key
+            tasks_deduplicated.inc(task=name)
+            return False
+        tasks_enqueued.inc(task=name)
+        self._wakeup.set()
+        return True
+
+    async def _claim(self, db: AsyncIOMotorDatabase) -> Optional[Dict]:
+        now = datetime.utcnow()
+        return await db.tasks.find_one_and_update(
+            {"$or": [
+                {"status": "pending", "run_at": {"$lte": now}},
+                {"status": "running", "locked_until": {"$lt": now}},
+            ]},
+            {
+                "$set": {"status": "running", "locked_until": now + timedelta(seconds=TASK_LEASE_SECONDS)},
+                "$unset": {"dedup_key": ""},  # Later enqueues with this key queue behind it
+                "$inc": {"attempts": 1},
+            },
+            sort=[("run_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _finish(self, db: AsyncIOMotorDatabase, task: Dict, error: Optional[str] = None) -> str:
+        now = datetime.utcnow()
+        if error is None:
+            outcome, update = "success", {
+                "status": "done", "finished_at": now,
+                "expires_at": now + timedelta(days=TASK_RETENTION_DAYS),
+            }
+        elif task["attempts"] < TASK_MAX_ATTEMPTS:
+            outcome, update = "retry", {
+                "status": "pending", "last_error": error,
+                "run_at": now + timedelta(seconds=backoff_seconds(task["attempts"])),
+            }
+        else:
+            outcome, update = "failed", {
+                "status": "failed", "last_error": error, "finished_at": now,
+                "expires_at": now + timedelta(days=TASK_RETENTION_DAYS),
+            }
+        await db.tasks.update_one({"id": task["id"]}, {"$set": update, "$unset": {"locked_until": ""}})
+        return outcome
+
+    async def _run_task(self, db: AsyncIOMotorDatabase, task: Dict):
+        name = task["name"]
+        handler = TASK_HANDLERS.get(name)
+        if task["attempts"] == 1:
+            task_queue_delay.observe((datetime.utcnow() - task["created_at"]).total_seconds(), task=name)
+
+        error = None
+        tasks_running.inc(task=name)
+        start = time.perf_counter()
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for task {name!r}")
+            await handler(db, task["payload"])
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            logger.warning("Task %s (%s) attempt %s failed: %s", name, task["id"], task["attempts"], error)
+        finally:
+            tasks_running.dec(task=name)
+            task_duration.observe(time.perf_counter() - start, task=name)
+
+        outcome = await self._finish(db, task, error)
+        tasks_finished.inc(task=name, outcome=outcome)
+        if outcome == "failed":
+            logger.error("Task %s (%s) failed permanently after %s attempts", name, task["id"], task["attempts"])
+
+    async def _worker(self, db: AsyncIOMotorDatabase):
+        while True:
+            try:
+                task = await self._claim(db)
+            except PyMongoError:
+                logger.exception("Claiming a task failed")
+                task = None
+            if task is not None:
+                try:
+                    await self._run_task(db, task)
+                except PyMongoError:
+                    # The lease expires and the task is claimed again
+                    logger.exception("Recording the outcome of task %s failed", task["id"])
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), TASK_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def relay_outbox(self, db: AsyncIOMotorDatabase, collection: str) -> int:
+        """Move embedded outbox entries into the task queue; returns the number relayed."""
+        docs = await db[collection].find(
+            {"outbox.id": {"$exists": True}}, {"_id": 1, "outbox": 1}
+        ).limit(OUTBOX_BATCH_SIZE).to_list(OUTBOX_BATCH_SIZE)
+        for doc in docs:
+            for entry in doc["outbox"]:
+                await self.enqueue(db, entry["name"], entry["payload"], entry.get("dedup_key"), task_id=entry["id"])
+            await db[collection].update_one(
+                {"_id": doc["_id"]},
+                {"$pull": {"outbox": {"id": {"$in": [entry["id"] for entry in doc["outbox"]]}}}}
+            )
+        return sum(len(doc["outbox"]) for doc in docs)
+
+    async def _relay(self, db: AsyncIOMotorDatabase):
+        while True:
+            self._outbox_wakeup.clear()
+            for collection in OUTBOX_COLLECTIONS:
+                try:
+                    while await self.relay_outbox(db, collection) >= OUTBOX_BATCH_SIZE:
+                        pass
+                except PyMongoError:
+                    logger.exception("Outbox relay for %s failed", collection)
+            try:
+                await asyncio.wait_for(self._outbox_wakeup.wait(), OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self, db: AsyncIOMotorDatabase, workers: int = TASK_WORKERS):
+        """Run the outbox relay and the worker pool (runs until cancelled)."""
+        await asyncio.gather(self._relay(db), *(self._worker(db) for _ in range(workers)))
+
+task_queue = TaskQueue()
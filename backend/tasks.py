@@ -0,0 +1,67 @@
+from datetime import datetime
+from typing import Any, Dict
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from analytics import REFRESH_DAILY_STATS, refresh_booking_daily_stats
+from home_bundle import home_bundle
+from payments import submit_payment
+from task_queue import task_handler
+
+# Task names
+UPDATE_PROPERTY_RATING = "property.update_rating"
+SUBMIT_PAYMENT = "payment.submit"
+
+# Delay of the recompute queued before a review is deleted, well past any delete's socket timeout
+RATING_DELETE_SAFETY_DELAY_SECONDS = 60
+
+def rating_task_key(property_id: str) -> str:
+    return f"{UPDATE_PROPERTY_RATING}:{property_id}"
+
+def payment_task_key(payment_id: str) -> str:
+    return f"{SUBMIT_PAYMENT}:{payment_id}"
+
+@task_handler(UPDATE_PROPERTY_RATING)
+async def update_property_rating(db: AsyncIOMotorDatabase, payload: Dict[str, Any]):
+    """Update property's average rating and review count"""
+    property_id = payload["property_id"]
+
+    # Calculate new average rating
+    pipeline = [
+        {"$match": {"property_id": property_id}},
+        {"$group": {
+            "_id": None,
+            "average_rating": {"$avg": "$rating"},
+            "review_count": {"$sum": 1}
+        }}
+    ]
+
+    result = await db.reviews.aggregate(pipeline).to_list(1)
+
+    if result:
+        avg_rating = round(result[0]["average_rating"], 1)
+        review_count = result[0]["review_count"]
+    else:
+        avg_rating = None
+        review_count = 0
+
+    # Update property
+    await db.properties.update_one(
+        {"id": property_id},
+        {"$set": {
+            "average_rating": avg_rating,
+            "review_count": review_count,
+            "updated_at": datetime.utcnow()
+        }}
+    )
+    home_bundle.invalidate()
+
+@task_handler(SUBMIT_PAYMENT)
+async def submit_payment_task(db: AsyncIOMotorDatabase, payload: Dict[str, Any]):
+    """Send a payment intent to the gateway; gateway errors are retried with backoff"""
+    await submit_payment(db, payload["payment_id"])
+
+@task_handler(REFRESH_DAILY_STATS)
+async def refresh_daily_stats_task(db: AsyncIOMotorDatabase, payload: Dict[str, Any]):
+    """Recompute the owner analytics rollups touched by a booking change"""
+    await refresh_booking_daily_stats(db, payload)
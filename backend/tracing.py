@@ -0,0 +1,218 @@
+import functools
+import json
+import logging
+import os
+import random
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from db_monitoring import command_collection
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+TRACING_EXPORTER = os.environ.get("TRACING_EXPORTER", "none").lower()  # "none" or "jsonl"
+TRACE_FILE = os.environ.get("TRACE_FILE", "traces.jsonl")
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0.01"))
+
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+class Span:
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = "ok"
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def end(self, end_ns: Optional[int] = None):
+        self.end_ns = end_ns or time.time_ns()
+        self.trace.finished(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+class Trace:
+    """Finished spans of one sampled request, exported together when the root span ends."""
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def finished(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+class SpanExporter:
+    """Base exporter; subclasses ship finished spans somewhere."""
+
+    def export(self, spans: List[Span]):
+        raise NotImplementedError
+
+class JsonLinesExporter(SpanExporter):
+    """Append spans as JSON lines to a local file (works offline)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]):
+        lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+_exporter: Optional[SpanExporter] = JsonLinesExporter(TRACE_FILE) if TRACING_EXPORTER == "jsonl" else None
+
+def set_exporter(exporter: Optional[SpanExporter]):
+    """Install a span exporter (``None`` disables tracing)."""
+    global _exporter
+    _exporter = exporter
+
+def tracing_enabled() -> bool:
+    return _exporter is not None
+
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+@contextmanager
+def start_span(name: str, **attributes):
+    """Open a child span of the current span; a no-op when the request is not sampled."""
+    parent = current_span.get()
+    if parent is None:
+        yield None
+        return
+    span = Span(parent.trace, name, parent.span_id, attributes)
+    token = current_span.set(span)
+    try:
+        yield span
+    except BaseException:
+        span.status = "error"
+        raise
+    finally:
+        current_span.reset(token)
+        span.end()
+
+def traced(name: str):
+    """Decorator wrapping an async function in a span."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with start_span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """Parse a W3C traceparent header into (trace_id, parent_id, sampled)."""
+    match = TRACEPARENT_RE.match((header or "").strip().lower())
+    if not match:
+        return None
+    trace_id, parent_id, flags = match.groups()
+    if trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 0x01)
+
+# In-flight Mongo command spans, keyed by (connection_id, request_id)
+_pending_spans: Dict[Tuple, Span] = {}
+_pending_lock = threading.Lock()
+
+class TracingListener(monitoring.CommandListener):
+    """Record a child span for every Mongo command issued by a sampled request."""
+
+    def started(self, event):
+        parent = current_span.get()
+        if parent is None:
+            return
+        collection = command_collection(event.command_name, event.command)
+        span = Span(parent.trace, f"mongo.{event.command_name}", parent.span_id, {
+            "db.collection": collection,
+            "db.operation": event.command_name,
+        })
+        with _pending_lock:
+            _pending_spans[(event.connection_id, event.request_id)] = span
+
+    def _finished(self, event, status: str):
+        with _pending_lock:
+            span = _pending_spans.pop((event.connection_id, event.request_id), None)
+        if span is not None:
+            span.status = status
+            span.end(span.start_ns + event.duration_micros * 1000)
+
+    def succeeded(self, event):
+        self._finished(event, "ok")
+
+    def failed(self, event):
+        self._finished(event, "error")
+
+class TracingMiddleware:
+    """Start a request span per sampled request, honouring incoming traceparent headers."""
+
+    def __init__(self, app: ASGIApp, sample_rate: float = TRACE_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or _exporter is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        incoming = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        if incoming:
+            trace_id, parent_id, sampled = incoming
+        else:
+            trace_id, parent_id, sampled = secrets.token_hex(16), None, random.random() < self.sample_rate
+        if not sampled:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(trace_id)
+        span = Span(trace, f"{scope['method']} {scope['path']}", parent_id, {"http.method": scope["method"]})
+        token = current_span.set(span)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"traceparent", f"00-{trace_id}-{span.span_id}-01".encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
+            span.status = "error"
+            raise
+        finally:
+            current_span.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                span.name = f"{scope['method']} {route.path}"
+            span.end()
+            try:
+                _exporter.export(trace.spans)
+            except Exception:
+                logger.exception("Span export failed")
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { Card, CardContent } from './ui/card';
 import { Button } from './ui/button';
-import { blogAPI } from '../services/api';
+import { contentAPI } from '../services/api';
 
 const Blog = () => {
   const [blogPosts, setBlogPosts] = useState([]);
@@ -10,8 +10,8 @@ const Blog = () => {
   useEffect(() => {
     const fetchBlogPosts = async () => {
       try {
-        const response = await blogAPI.getPosts({ limit: 4 });
-        setBlogPosts(response.data);
+        const response = await contentAPI.getHome();
+        setBlogPosts(response.data.blog_posts);
       } catch (error) {
         console.error('Error fetching blog posts:', error);
         // Fallback to mock data if API fails
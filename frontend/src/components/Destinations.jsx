@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { Card, CardContent } from './ui/card';
-import { destinationsAPI } from '../services/api';
+import { contentAPI } from '../services/api';
 
 const Destinations = () => {
   const [destinations, setDestinations] = useState([]);
@@ -9,8 +9,8 @@ const Destinations = () => {
   useEffect(() => {
     const fetchDestinations = async () => {
       try {
-        const response = await destinationsAPI.getAll();
-        setDestinations(response.data);
+        const response = await contentAPI.getHome();
+        setDestinations(response.data.destinations);
       } catch (error) {
         console.error('Error fetching destinations:', error);
         // Fallback to mock data if API fails
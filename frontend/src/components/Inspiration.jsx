@@ -9,8 +9,8 @@ const Inspiration = () => {
   useEffect(() => {
     const fetchInspirationCategories = async () => {
       try {
-        const response = await contentAPI.getInspiration();
-        setInspirationCategories(response.data);
+        const response = await contentAPI.getHome();
+        setInspirationCategories(response.data.inspiration);
       } catch (error) {
         console.error('Error fetching inspiration categories:', error);
         // Fallback to mock data if API fails
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { Card, CardContent } from './ui/card';
-import { propertiesAPI } from '../services/api';
+import { contentAPI } from '../services/api';
 
 const LatestProperties = () => {
   const [properties, setProperties] = useState([]);
@@ -9,8 +9,8 @@ const LatestProperties = () => {
   useEffect(() => {
     const fetchProperties = async () => {
       try {
-        const response = await propertiesAPI.getAll({ limit: 12 });
-        setProperties(response.data);
+        const response = await contentAPI.getHome();
+        setProperties(response.data.properties);
       } catch (error) {
         console.error('Error fetching properties:', error);
         // Fallback to mock data if API fails
@@ -76,7 +76,18 @@ export const blogAPI = {
 };
 
 // Content API
+// The homepage sections mount together; share one in-flight bundle request
+let homeRequest = null;
+
 export const contentAPI = {
+  getHome: () => {
+    if (!homeRequest) {
+      homeRequest = api.get('/home').finally(() => {
+        homeRequest = null;
+      });
+    }
+    return homeRequest;
+  },
   getInspiration: () => api.get('/inspiration'),
   getSpecialOffers: (activeOnly = true) => api.get('/special-offers', { 
     params: { active_only: activeOnly } 
@@ -0,0 +1,53 @@
+"""Every route query shape must be served by a selective index.
+
+Seeds a scratch database (created with ``create_indexes``) with the index
+audit's synthetic data, sized so that wide scans are visible, explains each
+shape of ``scripts/index_audit.py`` and applies the audit's checks: no
+collection scan, no blocking sort and no more than
+``MAX_DOCS_EXAMINED_RATIO`` documents examined per result. Needs a mongod:
+skipped unless ``MONGO_URL`` is set, e.g.
+
+    MONGO_URL=mongodb://localhost:27017 python -m pytest tests/test_index_plans.py
+"""
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR / "scripts"))
+
+MONGO_URL = os.environ.get("MONGO_URL")
+
+if not MONGO_URL:
+    pytest.skip("MONGO_URL is not set", allow_module_level=True)
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from database import create_indexes
+from index_audit import QUERY_SHAPES, audit_plan, explain_shape, seed_audit_data
+
+async def _explain_all():
+    client = AsyncIOMotorClient(MONGO_URL, serverSelectionTimeoutMS=5000)
+    db_name = f"purefrance_index_plans_{uuid.uuid4().hex[:8]}"
+    db = client[db_name]
+    try:
+        await create_indexes(db)
+        await seed_audit_data(db)
+        return {shape.route: await explain_shape(db, shape) for shape in QUERY_SHAPES}
+    finally:
+        await client.drop_database(db_name)
+        client.close()
+
+@pytest.fixture(scope="module")
+def explains():
+    return asyncio.run(_explain_all())
+
+@pytest.mark.parametrize("shape", QUERY_SHAPES, ids=[shape.route for shape in QUERY_SHAPES])
+def test_query_shape_uses_a_selective_index(explains, shape):
+    problems = audit_plan(shape, explains[shape.route])
+    assert not problems, f"{shape.route} on {shape.collection}: {'; '.join(problems)}"